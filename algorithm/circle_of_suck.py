@@ -1,115 +1,733 @@
+import os
+import random
+import time
+from itertools import permutations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
 from anytree import PreOrderIter
-from algorithm.data import CircleOfSuck, GroupNode, TeamNode, Game
-
-# check for any winless or undefeated teams
-def hamiltonian_sufficiency_check(matrix):
-    def has_win_and_loss(arr):
-        has_one = False
-        has_zero = False
-        for value in arr:
-            if value == 1:
-                has_one = True
-            elif value == 0:
-                has_zero = True
-            if has_one and has_zero:
-                return True
-        return False
+from algorithm.data import CircleOfSuck, SolverState, GroupNode, TeamNode, Game
+from algorithm.graph import to_bitmasks, transpose, bits, lowest_bit, popcount, reverse_exists, is_strongly_connected, is_semicomplete, condensation
+
+# roughly how many tasks each worker should get, and how many more teams than
+# every other exactly searched group a group needs before suck_parallel gives
+# its search every worker instead of one
+TASKS_PER_WORKER = 4
+DOMINANT_MARGIN = 8
+
+# how many steps search_cycle takes between checks of its stop event
+STOP_CHECK_STEPS = 1024
+
+# groups with at most this many teams are solved together by trying every cycle,
+# past it the (n - 1)! cycles cost more than a depth-first search per group
+BATCH_LIMIT = 7
+
+# cycles_of_size results, by number of teams
+CYCLES = {}
+
+# endpoints of the paths covering subset that can still be extended into a cycle
+# back to start, checking the teams left to visit:
+# - every one needs someone left (or start, for the last one) to beat
+# - the last one has to beat start, so one of them must have
+# - one with no predecessor left but the endpoint has to follow the endpoint,
+#   and the endpoint has to beat one of them
+def feasible_endpoints(wins, losses, full, subset, endpoints, start):
+    remaining = full ^ subset
+    if not remaining:
+        return endpoints
+    if not losses[start] & remaining:
+        return 0
+
+    predecessors = 0
+    for team in bits(remaining):
+        if not wins[team] & (remaining | (1 << start)):
+            return 0
+        if not losses[team] & remaining:
+            endpoints &= losses[team]
+        predecessors |= losses[team]
+    return endpoints & predecessors
+
+# depth-first search for a path from prefix through every team that ends on a
+# team that beat team 0, trying the lowest numbered team first
+# dead[visited] is a bitmask of the endpoints from which the teams outside
+# visited were shown not to close a cycle, so no (visited, endpoint) state is
+# searched twice, and feasible_endpoints drops a state before it is searched
+# a team whose only unvisited predecessor is the endpoint has to come next
+# gives up once stop (a multiprocessing event) is set
+# returns the cycle, or None if there is none
+def search_cycle(wins, prefix=(0,), stop=None):
+    num_teams = len(wins)
+    full = (1 << num_teams) - 1
+    losses = transpose(wins)
+
+    def candidates(node, remaining):
+        options = wins[node] & remaining
+        forced = [team for team in bits(options) if not losses[team] & remaining & ~(1 << team)]
+        if len(forced) > 1:
+            return []
+        if forced:
+            return forced
+        return list(bits(options))[::-1]
+
+    path = list(prefix)
+    visited = 0
+    for team in path:
+        visited |= 1 << team
+    if visited == full:
+        return path + [0] if wins[path[-1]] & 1 else None
+
+    dead = {}
+    stack = [candidates(path[-1], full ^ visited)]
+    steps = 0
+    while stack:
+        steps += 1
+        if stop is not None and steps % STOP_CHECK_STEPS == 0 and stop.is_set():
+            return None
+
+        # backtrack once every candidate has been tried
+        if not stack[-1]:
+            stack.pop()
+            dead[visited] = dead.get(visited, 0) | (1 << path[-1])
+            visited ^= 1 << path.pop()
+            continue
+
+        next_node = stack[-1].pop()
+        next_visited = visited | (1 << next_node)
+        if next_visited == full:
+            if wins[next_node] & 1:
+                return path + [next_node, 0]
+            continue
+        if dead.get(next_visited, 0) >> next_node & 1:
+            continue
+        if not feasible_endpoints(wins, losses, full, next_visited, 1 << next_node, 0):
+            dead[next_visited] = dead.get(next_visited, 0) | (1 << next_node)
+            continue
+
+        path.append(next_node)
+        visited = next_visited
+        stack.append(candidates(next_node, full ^ visited))
+
+    return None
+
+# splits one search_cycle across a pool of worker processes
+# paths from team 0 are extended here, one team at a time and lowest numbered
+# team first, until there are about TASKS_PER_WORKER of them per worker, keeping
+# one path per (visited, endpoint) state that feasible_endpoints allows
+# every path becomes its own task in the order the serial search would reach
+# it, so a worker that finishes early pulls the next one off the shared queue
+# the first worker to close a cycle sets stop, which the others check every
+# STOP_CHECK_STEPS steps, and every task that has not started is cancelled
+# each task keeps its own dead states, a state shown dead in one worker is
+# searched again if another worker reaches it
+def split_search_cycle(wins, workers):
+    num_teams = len(wins)
+    full = (1 << num_teams) - 1
+    losses = transpose(wins)
+
+    # prefixes[(visited, endpoint)] is one path from team 0 reaching that state
+    prefixes = {(1, 0): [0]}
+    depth = 1
+    while len(prefixes) < workers * TASKS_PER_WORKER and depth < num_teams - 1:
+        expanded = {}
+        for (visited, endpoint), prefix in prefixes.items():
+            for next_node in bits(wins[endpoint] & (full ^ visited)):
+                state = (visited | (1 << next_node), next_node)
+                if state not in expanded and feasible_endpoints(wins, losses, full, state[0], 1 << next_node, 0):
+                    expanded[state] = prefix + [next_node]
+        if not expanded:
+            return None
+        prefixes = expanded
+        depth += 1
+
+    with Manager() as manager:
+        stop = manager.Event()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(search_cycle, wins, prefix, stop) for prefix in prefixes.values()]
+            for future in as_completed(futures):
+                cycle = future.result()
+                if cycle is not None:
+                    stop.set()
+                    for other in futures:
+                        other.cancel()
+                    return cycle
+
+    return None
+
+# constructive proof of camion's theorem: every strongly connected tournament
+# has a hamiltonian cycle, also holds when some pairs of teams split their games
+# grows a cycle through team 0 one team at a time in O(n^2) bitmask operations
+def tournament_hamiltonian_cycle(wins):
+    num_teams = len(wins)
+    losses = transpose(wins)
+
+    # start from a 2-cycle or 3-cycle through team 0
+    split = wins[0] & losses[0]
+    if split:
+        cycle = [0, lowest_bit(split)]
+    else:
+        for team in bits(wins[0]):
+            beat_start = wins[team] & losses[0]
+            if beat_start:
+                cycle = [0, team, lowest_bit(beat_start)]
+                break
+    on_cycle = 0
+    for team in cycle:
+        on_cycle |= 1 << team
+
+    while len(cycle) < num_teams:
+        outside = list(bits(((1 << num_teams) - 1) ^ on_cycle))
+
+        # a team that beat one team on the cycle and lost to another can be
+        # inserted between some consecutive pair u -> team -> v
+        insertable = next((team for team in outside if wins[team] & on_cycle and losses[team] & on_cycle), None)
+        if insertable is not None:
+            for i in range(len(cycle)):
+                if losses[insertable] >> cycle[i] & 1 and wins[insertable] >> cycle[(i + 1) % len(cycle)] & 1:
+                    cycle.insert(i + 1, insertable)
+                    break
+            on_cycle |= 1 << insertable
+            continue
+
+        # otherwise every outside team beat the whole cycle or lost to the whole
+        # cycle, and strong connectivity guarantees some team that lost to the
+        # whole cycle beat some team that beat the whole cycle
+        beat_cycle = 0
+        for team in outside:
+            if not losses[team] & on_cycle:
+                beat_cycle |= 1 << team
+        for team in outside:
+            if not wins[team] & on_cycle and wins[team] & beat_cycle:
+                upset = lowest_bit(wins[team] & beat_cycle)
+                # replace the second team on the cycle with team -> upset,
+                # the second team goes back outside to be inserted later
+                on_cycle ^= (1 << cycle[1]) | (1 << team) | (1 << upset)
+                cycle = [cycle[0], team, upset] + cycle[2:]
+                break
+
+    cycle.append(0)
+    return cycle
+
+def single_bit(mask):
+    return mask & (mask - 1) == 0
+
+# contract the results every hamiltonian cycle is forced to use
+# a team with one win left has to be followed by the team it beat, so nobody
+# else can come before that team, and a team with one loss left has to follow
+# the team it lost to, so that team cannot go anywhere else
+# forced results chain into paths, and the result from the end of a path back
+# to its start would close a cycle too short to cover everyone
+# the rules are applied until none of them removes another result
+# returns None when a team is left with no win or no loss, or the forced results
+# close a cycle too short, otherwise paths[i] is the teams contracted into node i
+# of the kernel and kernel_wins its win bitmasks, paths[0] holds team 0
+def kernelize(wins):
+    num_teams = len(wins)
+    wins = wins[:]
+    losses = transpose(wins)
+
+    def remove(winner, loser):
+        wins[winner] ^= 1 << loser
+        losses[loser] ^= 1 << winner
+
+    while True:
+        changed = False
+        for team in range(num_teams):
+            if not wins[team] or not losses[team]:
+                return None
+            if single_bit(wins[team]):
+                for other in bits(losses[lowest_bit(wins[team])] ^ (1 << team)):
+                    remove(other, lowest_bit(wins[team]))
+                    changed = True
+            if single_bit(losses[team]):
+                for other in bits(wins[lowest_bit(losses[team])] ^ (1 << team)):
+                    remove(lowest_bit(losses[team]), other)
+                    changed = True
+        if changed:
+            continue
+
+        # every team is forced both ways, the forced results are the only cycle
+        # if they go through everyone
+        heads = [team for team in range(num_teams) if not single_bit(losses[team])]
+        if not heads:
+            path = [0]
+            while wins[path[-1]] != 1:
+                path.append(lowest_bit(wins[path[-1]]))
+            return ([path], [1]) if len(path) == num_teams else None
+
+        # follow the forced results from every team with more than one loss left
+        paths = []
+        covered = 0
+        for head in heads:
+            path = [head]
+            while single_bit(wins[path[-1]]):
+                path.append(lowest_bit(wins[path[-1]]))
+            covered |= sum(1 << team for team in path)
+            paths.append(path)
+            if len(path) > 1 and len(path) < num_teams and wins[path[-1]] >> head & 1:
+                remove(path[-1], head)
+                changed = True
+
+        # teams no path reached are on a shorter cycle of forced results
+        if covered != (1 << num_teams) - 1:
+            return None
+        if not changed:
+            break
+
+    paths.sort(key=lambda path: 0 not in path)
+    node_of = {}
+    for node, path in enumerate(paths):
+        for team in path:
+            node_of[team] = node
+    kernel_wins = []
+    for path in paths:
+        mask = 0
+        for team in bits(wins[path[-1]]):
+            mask |= 1 << node_of[team]
+        kernel_wins.append(mask)
+    return paths, kernel_wins
 
-    for row in matrix:
-        if not has_win_and_loss(row):
-            return False
-    for col in range(len(matrix[0])):
-        column = [matrix[row][col] for row in range(len(matrix))]
-        if not has_win_and_loss(column):
-            return False
-    return True
-
-def find_hamiltonian_cycle(adj_matrix):
-    if hamiltonian_sufficiency_check(adj_matrix) is False:
+# the checks every search for a cycle starts with, cheapest first: too few teams,
+# some team that cannot reach the others, a round robin that camion's theorem
+# solves outright, and kernelize running into a contradiction
+# returns (True, cycle) when they settle the question, cycle None if there is
+# none, otherwise (False, kernel) with what kernelize returned left to search
+def presolve(wins):
+    if len(wins) < 2 or not is_strongly_connected(wins):
+        return True, None
+    if is_semicomplete(wins):
+        return True, tournament_hamiltonian_cycle(wins)
+    kernel = kernelize(wins)
+    if kernel is None:
+        return True, None
+    return False, kernel
+
+# true when wins is proven to have no hamiltonian cycle without searching
+def rules_out_cycle(wins):
+    solved, cycle = presolve(wins)
+    return solved and cycle is None
+
+# solve the kernel with solve and expand its cycle back into the teams of the
+# original graph, a kernel of a single path only needs its last team to beat
+# its first
+def solve_kernel(paths, kernel_wins, solve):
+    if len(paths) == 1:
+        cycle = [0, 0] if kernel_wins[0] & 1 else None
+    else:
+        cycle = solve(kernel_wins)
+    if cycle is None:
+        return None
+
+    # rotate the cycle so it starts and ends with team 0
+    path = [team for node in cycle[:-1] for team in paths[node]]
+    index = path.index(0)
+    return path[index:] + path[:index] + [0]
+
+# splits the search across a pool of worker processes when workers is more than one
+# with low_memory searches with inclusion_exclusion_cycle instead of search_cycle
+def find_hamiltonian_cycle(adj_matrix, workers=None, low_memory=False):
+    return hamiltonian_cycle(to_bitmasks(adj_matrix), workers, low_memory)
+
+# same as find_hamiltonian_cycle, but takes the win bitmasks directly
+def hamiltonian_cycle(wins, workers=None, low_memory=False):
+    solved, result = presolve(wins)
+    if solved:
+        return result
+
+    # search the kernel left once the forced results are contracted
+    paths, kernel_wins = result
+    if len(paths) < len(wins):
+        return solve_kernel(paths, kernel_wins, lambda kernel_wins: hamiltonian_cycle(kernel_wins, workers, low_memory))
+
+    if low_memory:
+        return inclusion_exclusion_cycle(wins, workers)
+
+    if workers is not None and workers > 1:
+        return split_search_cycle(wins, workers)
+    return search_cycle(wins)
+
+# closed walks of len(wins) steps from team 0 that only go through the teams
+# in allowed before returning to team 0, only the walk count per team is kept
+def closed_walks(wins, losses, allowed):
+    counts = {0: 1}
+    for _ in range(len(wins) - 1):
+        next_counts = {}
+        for team, count in counts.items():
+            for next_team in bits(wins[team] & allowed):
+                next_counts[next_team] = next_counts.get(next_team, 0) + count
+        if not next_counts:
+            return 0
+        counts = next_counts
+    return sum(count for team, count in counts.items() if losses[0] >> team & 1)
+
+# the terms of the inclusion-exclusion sum for the excluded sets numbered first
+# to last - 1, set k leaves out the teams of the bits of k << 1
+# module level so a chunk of the sum can run in a worker process
+def inclusion_exclusion_terms(wins, first, last):
+    losses = transpose(wins)
+    others = (1 << len(wins)) - 2
+    total = 0
+    for excluded in range(first, last):
+        walks = closed_walks(wins, losses, others ^ (excluded << 1))
+        total += -walks if popcount(excluded) & 1 else walks
+    return total
+
+# number of hamiltonian cycles by inclusion-exclusion over the teams a closed
+# walk from team 0 leaves out (karp, bax): the walks of len(wins) steps that
+# leave out nobody are exactly the cycles
+# takes 2^(n - 1) walk counts but only ever stores one vector of counts, where
+# count_paths can hold a state for every subset of teams
+# the sum is split into chunks over a pool of worker processes when workers is
+# more than one
+def inclusion_exclusion_count(wins, workers=None):
+    terms = 1 << (len(wins) - 1)
+    if workers is None or workers < 2:
+        return inclusion_exclusion_terms(wins, 0, terms)
+
+    chunk = -(-terms // (workers * TASKS_PER_WORKER))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(inclusion_exclusion_terms, wins, first, min(first + chunk, terms)) for first in range(0, terms, chunk)]
+        return sum(future.result() for future in futures)
+
+# find a hamiltonian cycle with nothing but inclusion_exclusion_count
+# once a cycle is known to exist, keep whichever half of team 0's wins still
+# leaves one until a single team is left to follow team 0, then hamiltonian_cycle
+# contracts that result and carries on with the smaller kernel
+def inclusion_exclusion_cycle(wins, workers=None):
+    if not inclusion_exclusion_count(wins, workers):
+        return None
+
+    candidates = wins[0]
+    restricted = wins[:]
+    while not single_bit(candidates):
+        half = 0
+        for team in list(bits(candidates))[:popcount(candidates) // 2]:
+            half |= 1 << team
+        restricted[0] = half
+        candidates = half if inclusion_exclusion_count(restricted, workers) else candidates ^ half
+    restricted[0] = candidates
+    return hamiltonian_cycle(restricted, workers, low_memory=True)
+
+# every cycle through n teams that starts and ends on team 0, each with the bitmask
+# of the results it needs in a flattened adjacency (bit u * n + v set if u beat v)
+def cycles_of_size(n):
+    if n not in CYCLES:
+        cycles = []
+        for order in permutations(range(1, n)):
+            cycle = (0,) + order + (0,)
+            mask = 0
+            for u, v in zip(cycle, cycle[1:]):
+                mask |= 1 << (u * n + v)
+            cycles.append((list(cycle), mask))
+        CYCLES[n] = cycles
+    return CYCLES[n]
+
+# find a hamiltonian cycle in each of many small groups with the same number of teams
+# the flattened adjacency of every group gets its own block of n * n + 1 bits in one
+# integer, so a cycle is tested against every group at once with a few integer
+# operations, the top bit of each block is a guard that the adjacency never sets
+# returns a cycle (or None) for every group, in order
+def batch_hamiltonian_cycles(wins_list):
+    num_teams = len(wins_list[0])
+    if num_teams < 2:
+        return [None] * len(wins_list)
+
+    width = num_teams * num_teams + 1
+    stacked = replicate = guards = 0
+    for group, wins in enumerate(wins_list):
+        flat = 0
+        for team, mask in enumerate(wins):
+            flat |= mask << (team * num_teams)
+        stacked |= flat << (group * width)
+        replicate |= 1 << (group * width)
+        guards |= 1 << (group * width + width - 1)
+    low = replicate * ((1 << (width - 1)) - 1)
+
+    cycles = [None] * len(wins_list)
+    remaining = guards
+    for cycle, mask in cycles_of_size(num_teams):
+        required = mask * replicate
+        missing = (stacked & required) ^ required
+
+        # adding low carries into the guard bit of every block still missing a result
+        found = remaining & ~((missing + low) & guards)
+        for guard in bits(found):
+            cycles[guard // width] = cycle
+        remaining ^= found
+        if not remaining:
+            break
+    return cycles
+
+# find a hamiltonian cycle that uses the edge winner -> loser
+# searches for a path from loser through every other team that ends on winner,
+# keeping winner out of the path until the very end
+def find_hamiltonian_cycle_through(adj_matrix, edge, low_memory=False, workers=None):
+    return hamiltonian_cycle_through(to_bitmasks(adj_matrix), edge, low_memory, workers)
+
+def hamiltonian_cycle_through(wins, edge, low_memory=False, workers=None):
+    winner, loser = edge
+    if len(wins) < 2 or not wins[winner] >> loser & 1:
         return None
 
-    memo = {}
-    path = []
-
-    def visit(node, visited):
-        # base case:
-        # if all nodes are visited
-        if visited == (1 << len(adj_matrix)) - 1:
-            # and if there's an edge back to the start node
-            if adj_matrix[node][0] == 1:
-                # circle of suck found, add the first node to path
-                path.append(0) 
+    # with loser as the only team winner beat, every cycle has to use the edge,
+    # and kernelize contracts it before the search
+    restricted = wins[:]
+    restricted[winner] = 1 << loser
+    return hamiltonian_cycle(restricted, workers, low_memory)
+
+# held-karp over (endpoint, subset) states, counting the paths to each
+# levels[k] maps every subset of k + 1 teams covered by a path starting at
+# team 0 to {endpoint: number of such paths ending on endpoint}
+# only the last level is kept unless keep_levels is set
+def count_paths(wins, keep_levels=False):
+    num_teams = len(wins)
+    full = (1 << num_teams) - 1
+    levels = [{1: {0: 1}}]
+
+    for _ in range(num_teams - 1):
+        frontier = {}
+        for subset, endpoints in levels[-1].items():
+            for endpoint, count in endpoints.items():
+                for next_node in bits(wins[endpoint] & (full ^ subset)):
+                    next_endpoints = frontier.setdefault(subset | (1 << next_node), {})
+                    next_endpoints[next_node] = next_endpoints.get(next_node, 0) + count
+        if keep_levels:
+            levels.append(frontier)
+        else:
+            levels = [frontier]
+
+    return levels
+
+# exact number of hamiltonian cycles, counting both directions of a cycle
+# separately when both are valid
+# with low_memory counts with inclusion_exclusion_count instead of count_paths
+def count_hamiltonian_cycles(adj_matrix, low_memory=False, workers=None):
+    if len(adj_matrix) < 2:
+        return 0
+
+    wins = to_bitmasks(adj_matrix)
+    if not is_strongly_connected(wins):
+        return 0
+
+    if low_memory:
+        return inclusion_exclusion_count(wins, workers)
+
+    full = (1 << len(wins)) - 1
+    endpoints = count_paths(wins)[-1].get(full, {})
+    return sum(count for endpoint, count in endpoints.items() if wins[endpoint] & 1)
+
+# draw one hamiltonian cycle uniformly at random by walking back through the
+# count table, choosing each previous team in proportion to its path count
+# returns None if no cycle exists
+def sample_hamiltonian_cycle(adj_matrix, rng=None):
+    if len(adj_matrix) < 2:
+        return None
+
+    wins = to_bitmasks(adj_matrix)
+    if not is_strongly_connected(wins):
+        return None
+
+    rng = rng or random.Random()
+    losses = transpose(wins)
+    levels = count_paths(wins, keep_levels=True)
+
+    def choose(weights):
+        total = sum(weights.values())
+        if total == 0:
+            return None
+        target = rng.randrange(total)
+        for node, weight in weights.items():
+            if target < weight:
+                return node
+            target -= weight
+
+    # choose the last team among those that beat team 0
+    subset = (1 << len(wins)) - 1
+    endpoints = levels[-1].get(subset, {})
+    node = choose({endpoint: count for endpoint, count in endpoints.items() if losses[0] & (1 << endpoint)})
+    if node is None:
+        return None
+
+    path = [0, node]
+    for level in range(len(levels) - 2, 0, -1):
+        subset ^= 1 << node
+        endpoints = levels[level][subset]
+        node = choose({endpoint: count for endpoint, count in endpoints.items() if losses[node] & (1 << endpoint)})
+        path.append(node)
+    path.append(0)
+    path.reverse()
+
+    return path
+
+# i-th term of the luby restart sequence: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+def luby(i):
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+# anytime search for groups too large for the exact search
+# runs randomized depth-first searches with restarts until one closes a cycle
+# or the time budget (in seconds) runs out
+# returns the cycle if found, returns None if the result is unknown
+def find_hamiltonian_cycle_heuristic(adj_matrix, time_budget, rng=None):
+    return hamiltonian_cycle_heuristic(to_bitmasks(adj_matrix), time_budget, rng)
+
+def hamiltonian_cycle_heuristic(wins, time_budget, rng=None):
+    solved, result = presolve(wins)
+    if solved:
+        return result
+
+    paths, kernel_wins = result
+    if len(paths) < len(wins):
+        return solve_kernel(paths, kernel_wins, lambda kernel_wins: hamiltonian_cycle_heuristic(kernel_wins, time_budget, rng))
+
+    rng = rng or random.Random()
+    deadline = time.monotonic() + time_budget
+    num_teams = len(wins)
+    losses = transpose(wins)
+    full = (1 << num_teams) - 1
+
+    # candidates for the team after node, ordered so the team with the fewest
+    # unvisited teams left to beat is popped first (warnsdorff's rule)
+    def order(node, remaining):
+        candidates = wins[node] & remaining
+
+        # a team whose only unvisited predecessor is node has to come next
+        forced = [team for team in bits(candidates) if not losses[team] & remaining]
+        if len(forced) > 1:
+            return []
+        if forced:
+            return forced
+
+        return sorted(bits(candidates), key=lambda team: (popcount(wins[team] & remaining), rng.random()), reverse=True)
+
+    # visiting node strands any unvisited team that has no one left to beat
+    def stranded(node, remaining, start):
+        for team in bits(losses[node] & remaining):
+            if not wins[team] & (remaining | (1 << start)):
                 return True
-            else:
-                return False
-
-        # get result if already cached
-        if (node, visited) in memo:
-            return memo[(node, visited)]
-
-        # explore possible next nodes
-        for next_node in range(len(adj_matrix)):
-            # if next_node is connected to node and not yet visited
-            if adj_matrix[node][next_node] == 1 and not (visited & (1 << next_node)):
-                path.append(next_node)
-
-                # recursive step:
-                # explore from next_node
-                if visit(next_node, visited | (1 << next_node)):
-                    # cache the result
-                    memo[(node, visited)] = True
-                    return True
-                
-                # backtrack
-                path.pop() 
-
-        # cache failure to find hamiltonian cycle from this node
-        memo[(node, visited)] = False
         return False
 
-    # start search with node 0
-    path.append(0)
-    if visit(0, 1 << 0):
-        return path
-    else:
+    def search(start, step_limit):
+        path = [start]
+        visited = 1 << start
+        stack = [order(start, full ^ visited)]
+        steps = 0
+
+        while stack:
+            # give up on this restart
+            steps += 1
+            if steps > step_limit or (steps % 1024 == 0 and time.monotonic() > deadline):
+                return None
+
+            # backtrack once every candidate has been tried
+            if not stack[-1]:
+                stack.pop()
+                visited ^= 1 << path.pop()
+                continue
+
+            next_node = stack[-1].pop()
+            path.append(next_node)
+            visited |= 1 << next_node
+            remaining = full ^ visited
+
+            # every team visited, close the cycle if next_node beat the start
+            if not remaining:
+                if wins[next_node] >> start & 1:
+                    return path
+            # keep going only while some unvisited team can still beat the start
+            elif losses[start] & (remaining | (1 << next_node)) and not stranded(next_node, remaining, start):
+                stack.append(order(next_node, remaining))
+                continue
+
+            visited ^= 1 << path.pop()
+
         return None
-    
+
+    # restart from random teams, following the luby sequence so most restarts
+    # are short but every so often one is allowed to search much longer
+    restart = 1
+    while time.monotonic() < deadline:
+        path = search(rng.randrange(num_teams), 4 * num_teams * luby(restart))
+        if path is not None:
+            # rotate the cycle so it starts and ends with team 0
+            index = path.index(0)
+            return path[index:] + path[:index] + [0]
+        restart += 1
+
+    return None
+
 # TODO: to be used in the future for mid-season updates
-def find_all_hamiltonian_paths(adj_matrix):
-    memo = {}
-    paths = []
-    path = []
-
-    def visit(node, visited):
-        # base case: if all nodes are visited
-        if visited == (1 << len(adj_matrix)) - 1:
-            paths.append(path.copy())
-            return
+# lazily yields every hamiltonian path, skipping a path if its reverse is also
+# a valid path and has already been yielded
+# stops after limit paths or once time.monotonic() passes deadline
+def find_all_hamiltonian_paths(adj_matrix, limit=None, deadline=None):
+    num_teams = len(adj_matrix)
+    wins = to_bitmasks(adj_matrix)
+    full = (1 << num_teams) - 1
 
-        # get result if already cached
-        if (node, visited) in memo:
+    # dead[visited] is a bitmask of endpoints from which the remaining teams
+    # cannot all be visited, shared by every start node
+    dead = {}
+    count = 0
+    steps = 0
+
+    for start_node in range(num_teams):
+        # stack[i] holds the untried candidates after path[i] and found[i]
+        # whether any path was completed below path[i]
+        path = [start_node]
+        visited = 1 << start_node
+        stack = [wins[start_node] & (full ^ visited)]
+        found = [visited == full]
+
+        # a single team is a path on its own
+        if visited == full:
+            yield path[:]
             return
 
-        # explore possible next nodes
-        for next_node in range(len(adj_matrix)):
-            # if next_node is connected to node and not yet visited
-            if adj_matrix[node][next_node] == 1 and not (visited & (1 << next_node)):
-                path.append(next_node)
-                # recursive step: explore from next_node
-                visit(next_node, visited | (1 << next_node))
-                # backtrack
-                path.pop()
+        while stack:
+            steps += 1
+            if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+                return
+
+            # backtrack once every candidate has been tried
+            if not stack[-1]:
+                stack.pop()
+                node = path.pop()
+                if found.pop():
+                    if found:
+                        found[-1] = True
+                else:
+                    dead[visited] = dead.get(visited, 0) | (1 << node)
+                visited ^= 1 << node
+                continue
+
+            low = stack[-1] & -stack[-1]
+            stack[-1] ^= low
+            next_node = low.bit_length() - 1
+            next_visited = visited | low
 
-        # cache that this node and visited state has been fully explored
-        memo[(node, visited)] = True
+            # skip states already known to be dead ends
+            if dead.get(next_visited, 0) & low:
+                continue
 
-    # start search from each node to find all paths
-    for start_node in range(len(adj_matrix)):
-        path.append(start_node)
-        visit(start_node, 1 << start_node)
-        path.pop()
+            # every team visited
+            if next_visited == full:
+                found[-1] = True
+                complete_path = path + [next_node]
+                if complete_path[0] > complete_path[-1] and reverse_exists(complete_path, wins):
+                    continue
+                yield complete_path
 
-    return paths
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+                continue
+
+            path.append(next_node)
+            visited = next_visited
+            stack.append(wins[next_node] & (full ^ visited))
+            found.append(False)
 
 def extract_games(root):
     games = []
@@ -147,19 +765,174 @@ def construct_graph(games, teams):
 
     return adj_matrix, edges
 
-# function to find circle of suck from a league hierarchy tree decorated with games
-# returns CircleOfSuck if circle of suck is found, returns None if no circle of suck found
-def suck(root):
+# list the components of a group that is not strongly connected, every
+# component never lost to any of the components after it
+def describe_condensation(components, teams):
+    names = ['{' + ', '.join(teams[i].name for i in component) + '}' for component in components]
+    return 'Not strongly connected: ' + ' -> '.join(names)
+
+# the teams, games and win bitmasks of a group, sliced out of league (a LeagueGraph)
+# when given, otherwise collected from the group's subtree
+def group_graph(root, league=None):
+    if league is not None:
+        return league.group_graph(root)
     games, teams = extract_games(root)
     adjacency_matrix, edges = construct_graph(games, teams)
-    circle_of_suck = find_hamiltonian_cycle(adjacency_matrix)
+    return teams, edges, to_bitmasks(adjacency_matrix)
 
+# function to find circle of suck from a league hierarchy tree decorated with games
+# searches with the anytime heuristic instead of the exact search when given a time budget
+# and with inclusion_exclusion_cycle instead of search_cycle when low_memory is set
+# returns CircleOfSuck if circle of suck is found, returns None if no circle of suck found
+def suck(root, time_budget=None, league=None, low_memory=False):
+    teams, edges, wins = group_graph(root, league)
+    if time_budget is None:
+        cycle = hamiltonian_cycle(wins, low_memory=low_memory)
+    else:
+        cycle = hamiltonian_cycle_heuristic(wins, time_budget)
+    return report_group(root, teams, edges, wins, cycle, time_budget)
+
+# solves one group from its win bitmasks, module level so it can run in a worker process
+# with a time budget runs the anytime heuristic, otherwise the exact search reusing state,
+# the SolverState saved for this group by the previous run:
+# results only ever get added, so a previous circle of suck still stands and any new one
+# has to use at least one of the games added since, only those cycles are searched
+# low_memory and workers are passed on to the exact search
+def solve_group(wins, state=None, time_budget=None, low_memory=False, workers=None):
+    if time_budget is not None:
+        return hamiltonian_cycle_heuristic(wins, time_budget)
+    if not is_strongly_connected(wins):
+        return None
+
+    # solve from scratch if the group changed shape or lost a result
+    if state is None or len(state.wins) != len(wins) or any(old & ~new for old, new in zip(state.wins, wins)):
+        return hamiltonian_cycle(wins, workers, low_memory)
+    if state.cycle is not None:
+        return state.cycle
+
+    for winner in range(len(wins)):
+        for loser in bits(wins[winner] & ~state.wins[winner]):
+            cycle = hamiltonian_cycle_through(wins, (winner, loser), low_memory, workers)
+            if cycle:
+                return cycle
+    return None
+
+# rough cost of solving a group, the search grows with the number of teams and
+# the number of games between them
+def solve_cost(wins):
+    return len(wins), sum(popcount(mask) for mask in wins)
+
+# everything solve_group needs for a group, and what its result is turned back into
+def prepare_group(root, state=None, league=None):
+    teams, edges, wins = group_graph(root, league)
+    team_ids = [team.id for team in teams]
+    if state is not None and state.team_ids != team_ids:
+        state = None
+    return teams, edges, wins, team_ids, state
+
+# prints what was found for a group and turns its cycle into a CircleOfSuck
+# a heuristic search that found nothing is unknown unless presolve rules out a cycle
+def report_group(root, teams, edges, wins, cycle, time_budget=None):
     print(root.name)
-    if circle_of_suck:
-        group_name = root.name
-        circle_of_suck =  CircleOfSuck(group_name, circle_of_suck, edges, teams)
+    components, _ = condensation(wins)
+    if len(components) > 1:
+        print(describe_condensation(components, teams))
+
+    if cycle:
+        circle_of_suck = CircleOfSuck(root.name, cycle, edges, teams)
         print(circle_of_suck)
+        return circle_of_suck
+    if time_budget is not None and not rules_out_cycle(wins):
+        print(f"Circle of Suck unknown after {time_budget} seconds\n")
     else:
         print("Unable to find Circle of Suck\n")
-    
-    return circle_of_suck
\ No newline at end of file
+    return None
+
+# function to find circle of suck reusing the SolverState saved for this group by the previous run
+# returns CircleOfSuck (or None) and the SolverState to save for the next run
+def suck_incremental(root, state=None, league=None, low_memory=False):
+    teams, edges, wins, team_ids, state = prepare_group(root, state, league)
+    cycle = solve_group(wins, state, low_memory=low_memory)
+    return report_group(root, teams, edges, wins, cycle), SolverState(team_ids, wins, cycle)
+
+# function to find circles of suck for many small groups at once, groups with the same
+# number of teams are searched together by batch_hamiltonian_cycles
+# groups is a list of (key, root), meant for groups of at most BATCH_LIMIT teams
+# returns key -> CircleOfSuck (or None) and key -> SolverState
+def suck_batch(groups, league=None):
+    prepared = {}
+    by_size = {}
+    for key, root in groups:
+        teams, edges, wins = group_graph(root, league)
+        prepared[key] = (root, teams, edges, wins)
+        by_size.setdefault(len(wins), []).append(key)
+
+    cycles = {}
+    for keys in by_size.values():
+        for key, cycle in zip(keys, batch_hamiltonian_cycles([prepared[key][3] for key in keys])):
+            cycles[key] = cycle
+
+    circles_of_suck = {}
+    new_states = {}
+    for key, (root, teams, edges, wins) in prepared.items():
+        circles_of_suck[key] = report_group(root, teams, edges, wins, cycles[key])
+        new_states[key] = SolverState([team.id for team in teams], wins, cycles[key])
+    return circles_of_suck, new_states
+
+# function to find circles of suck for many groups at once on a pool of worker processes
+# groups is a list of (key, root, time_budget) and states maps key -> SolverState
+# only each group's win bitmasks are sent to the workers, the most expensive groups first
+# an exactly searched group with DOMINANT_MARGIN more teams than every other one would
+# keep a single worker busy long after the rest are done, so it is searched first with
+# every worker splitting its search
+# returns key -> CircleOfSuck (or None) and key -> SolverState for the exactly solved groups
+def suck_parallel(groups, states=None, workers=None, league=None, low_memory=False):
+    states = states or {}
+    workers = workers or os.cpu_count()
+    prepared = {}
+    for name, root, time_budget in groups:
+        prepared[name] = (root, time_budget) + prepare_group(root, states.get(name), league)
+
+    circles_of_suck = {}
+    new_states = {}
+
+    def merge(name, cycle):
+        root, time_budget, teams, edges, wins, team_ids, state = prepared[name]
+        circles_of_suck[name] = report_group(root, teams, edges, wins, cycle, time_budget)
+        if time_budget is None:
+            new_states[name] = SolverState(team_ids, wins, cycle)
+
+    order = sorted(prepared, key=lambda name: solve_cost(prepared[name][4]), reverse=True)
+    exact = [name for name in order if prepared[name][1] is None]
+    if exact and all(len(prepared[exact[0]][4]) >= len(prepared[name][4]) + DOMINANT_MARGIN for name in exact[1:]):
+        root, time_budget, teams, edges, wins, team_ids, state = prepared[exact[0]]
+        merge(exact[0], solve_group(wins, state, low_memory=low_memory, workers=workers))
+        order.remove(exact[0])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for name in order:
+            root, time_budget, teams, edges, wins, team_ids, state = prepared[name]
+            futures[executor.submit(solve_group, wins, state, time_budget, low_memory)] = name
+
+        # merge results in the parent process as they finish
+        for future in as_completed(futures):
+            merge(futures[future], future.result())
+
+    return circles_of_suck, new_states
+
+# function to count every circle of suck in a league hierarchy tree decorated with games
+def count_sucks(root, low_memory=False, workers=None):
+    games, teams = extract_games(root)
+    adjacency_matrix, edges = construct_graph(games, teams)
+    return count_hamiltonian_cycles(adjacency_matrix, low_memory, workers)
+
+# function to draw one circle of suck uniformly at random from a league hierarchy tree decorated with games
+# returns CircleOfSuck if circle of suck is found, returns None if no circle of suck found
+def sample_suck(root, rng=None):
+    games, teams = extract_games(root)
+    adjacency_matrix, edges = construct_graph(games, teams)
+    circle_of_suck = sample_hamiltonian_cycle(adjacency_matrix, rng)
+    if circle_of_suck is None:
+        return None
+    return CircleOfSuck(root.name, circle_of_suck, edges, teams)
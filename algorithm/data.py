@@ -1,5 +1,6 @@
-from anytree import NodeMixin
+from anytree import NodeMixin, PreOrderIter
 from datetime import datetime
+from algorithm.graph import transpose, bits, popcount
 
 # ==================================================
 #                 utility functions
@@ -10,15 +11,43 @@ def convert_date(date_str):
     formatted_date = date_obj.strftime('%b %d, %Y').replace(" 0", " ")
     return formatted_date
 
+# number the groups in preorder and give every node a bitmask of the groups above
+# it (itself included), so an ancestor always has a lower number than its descendants
+# returns the groups in that order
+def index_hierarchy(root):
+    groups = []
+    for node in PreOrderIter(root):
+        parent_mask = node.parent.ancestor_mask if node.parent else 0
+        if isinstance(node, GroupNode):
+            node.index = len(groups)
+            node.ancestor_mask = parent_mask | 1 << node.index
+            groups.append(node)
+        else:
+            node.ancestor_mask = parent_mask
+    return groups
+
+# the groups two teams share form a chain from the root down, and the deepest of
+# them has the highest number
+def lowest_common_group(team_a, team_b, groups):
+    return groups[(team_a.ancestor_mask & team_b.ancestor_mask).bit_length() - 1]
+
 # ==================================================
 #              custom data structures
 # ==================================================
 
+# stands in for the id of a group that has none, the names of the groups from
+# the league down, which tells apart divisions that share a name
+def path_id(group_node):
+    return '/'.join(group.name for group in group_node.path)
+
+# groups are told apart by id, names can repeat across a league (e.g. every
+# conference may have an "East" division), groups without an id use path_id
 class GroupNode(NodeMixin):
-    def __init__(self, name, abbreviation, parent=None):
+    def __init__(self, name, abbreviation, parent=None, id=None):
         self.name = name
         self.abbreviation = abbreviation
         self.parent = parent
+        self.id = id if id is not None else path_id(self)
         self.games = set()
         self.upcoming_games = set()
 
@@ -51,7 +80,18 @@ class TeamNode(NodeMixin):
             'parent': self.parent.name if self.parent else None
         }
 
-class Game(NodeMixin):
+# restores a game pickled either with its slots or, from before them, with a __dict__
+# (which may also hold anytree bookkeeping from when games were tree nodes)
+def set_slots(game, state):
+    if isinstance(state, tuple):
+        state = {**(state[0] or {}), **state[1]}
+    for name in game.__slots__:
+        setattr(game, name, state[name])
+
+# games are never placed in the tree, so they are plain slotted records
+class Game:
+    __slots__ = ('id', 'date', 'week', 'home_team', 'away_team', 'home_score', 'away_score', 'home_team_won')
+
     def __init__(self, id, date, week, home_team, away_team, home_score, away_score, home_team_won):
         self.id = id
         self.date = date
@@ -67,6 +107,9 @@ class Game(NodeMixin):
 
     def __repr__(self):
         return self.__str__()
+
+    def __setstate__(self, state):
+        set_slots(self, state)
     
     def to_dict(self):
         return {
@@ -79,7 +122,9 @@ class Game(NodeMixin):
             'home_team_won': self.home_team_won
         }
     
-class UpcomingGame(NodeMixin):
+class UpcomingGame:
+    __slots__ = ('id', 'date', 'week', 'home_team', 'away_team')
+
     def __init__(self, id, date, week, home_team, away_team,):
         self.id = id
         self.date = date
@@ -92,13 +137,114 @@ class UpcomingGame(NodeMixin):
 
     def __repr__(self):
         return self.__str__()
+
+    def __setstate__(self, state):
+        set_slots(self, state)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'week': self.week,
+            'home_abbreviation': self.home_team.abbreviation,
+            'away_abbreviation': self.away_team.abbreviation
+        }
     
 class Tree:
-    def __init__(self, root, teams, groups, game_ids):
+    def __init__(self, root, teams, groups, game_ids, league=None):
         self.root = root
         self.teams = teams
         self.groups = groups
         self.game_ids = game_ids
+        self.league = league
+
+# the whole league as one graph, kept up to date as games are added
+# teams are numbered in preorder, so every group covers the contiguous range
+# [group.start, group.stop) of them, and bit j of wins[i] is set if team i beat
+# team j anywhere in the league
+# a group's win bitmasks are then a slice of wins shifted down to its first team
+class LeagueGraph:
+    def __init__(self, root):
+        self.groups = index_hierarchy(root)
+        self.teams = []
+        for node in PreOrderIter(root):
+            if isinstance(node, GroupNode):
+                node.start = len(self.teams)
+            elif isinstance(node, TeamNode):
+                node.position = len(self.teams)
+                self.teams.append(node)
+
+        # children come after their parents in preorder, so walking the groups
+        # backwards closes every child's range before its parent's
+        for group in reversed(self.groups):
+            group.stop = group.start
+            for child in group.children:
+                group.stop = max(group.stop, child.stop if isinstance(child, GroupNode) else child.position + 1)
+
+        self.wins = [0] * len(self.teams)
+        self.edges = {}
+
+    # adds game info to lowest common ancestor group node for the two teams
+    def add_game(self, game):
+        lowest_common_group(game.home_team, game.away_team, self.groups).games.add(game)
+
+        if game.home_team_won == True:
+            winner, loser = game.home_team.position, game.away_team.position
+        else:
+            winner, loser = game.away_team.position, game.home_team.position
+        self.wins[winner] |= 1 << loser
+        self.edges[(winner, loser)] = game
+
+    def add_upcoming_game(self, game):
+        lowest_common_group(game.home_team, game.away_team, self.groups).upcoming_games.add(game)
+
+    # size and degree statistics of every group in one pass over the teams, each
+    # team is counted in every group above it against that group's range
+    # returns group -> (teams, games, fewest wins, fewest losses) inside the group,
+    # a group where some team never won or never lost cannot have a circle of suck
+    def degree_stats(self):
+        losses = transpose(self.wins)
+        masks = [(1 << group.stop) - (1 << group.start) for group in self.groups]
+        games = [0] * len(self.groups)
+        fewest_wins = [len(self.teams)] * len(self.groups)
+        fewest_losses = [len(self.teams)] * len(self.groups)
+        for team in self.teams:
+            for index in bits(team.ancestor_mask):
+                team_wins = popcount(self.wins[team.position] & masks[index])
+                team_losses = popcount(losses[team.position] & masks[index])
+                games[index] += team_wins
+                fewest_wins[index] = min(fewest_wins[index], team_wins)
+                fewest_losses[index] = min(fewest_losses[index], team_losses)
+
+        stats = {}
+        for index, group in enumerate(self.groups):
+            stats[group] = (group.stop - group.start, games[index], fewest_wins[index], fewest_losses[index])
+        return stats
+
+    # the teams of a group, the games between them and their win bitmasks, all
+    # indexed from the group's first team
+    def group_graph(self, group):
+        start, stop = group.start, group.stop
+        mask = (1 << stop) - (1 << start)
+        wins = [(self.wins[team] & mask) >> start for team in range(start, stop)]
+        return self.teams[start:stop], GroupEdges(self.edges, start), wins
+
+# the games of a LeagueGraph between the teams of one group, (winner, loser)
+# pairs are indexed from the group's first team
+class GroupEdges:
+    def __init__(self, edges, start):
+        self.edges = edges
+        self.start = start
+
+    def __getitem__(self, edge):
+        return self.edges[(edge[0] + self.start, edge[1] + self.start)]
+
+# what the solver learned about a group on the previous run, so the next run
+# only has to search for circles through the games added since
+class SolverState:
+    def __init__(self, team_ids, wins, cycle):
+        self.team_ids = team_ids
+        self.wins = wins
+        self.cycle = cycle
 
 class CircleOfSuck:
     def __init__(self, group_name, cycle, edges, teams):
@@ -157,24 +303,33 @@ class PotentialCircleOfSuck:
             self.games.append(game)
             self.teams.append(team_mapping[cycle[i]])
 
+        self.pending_games = [game for game in self.games if game.id not in finished_game_ids]
+
     def __str__(self):
         str = ''
-        for game in self.games:
-            if game.home_team_won:
-                winning_team = game.home_team
-                winner_score = game.home_score
-                losing_team = game.away_team
-                loser_score = game.away_score
-            else:
-                winning_team = game.away_team
-                winner_score = game.away_score
-                loser_score = game.home_score
-                losing_team = game.home_team
+        # every team beats the next team around the circle
+        for i, game in enumerate(self.games):
+            winning_team = self.teams[i]
+            losing_team = self.teams[(i + 1) % len(self.teams)]
             if game.id in self.finished_game_ids:
+                if game.home_team is winning_team:
+                    winner_score = game.home_score
+                    loser_score = game.away_score
+                else:
+                    winner_score = game.away_score
+                    loser_score = game.home_score
                 str += f'{convert_date(game.date)} {winning_team} -> {losing_team}: {winner_score}-{loser_score}\n'
             else:
                 str += f'********{convert_date(game.date)} {winning_team} must defeat {losing_team}********\n'
         return str
 
     def __repr__(self):
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
+
+    def to_dict(self):
+        return {
+            'group_name': self.group_name,
+            'teams': [team.to_dict() for team in self.teams],
+            'games': [game.to_dict() for game in self.games],
+            'pending_game_ids': [game.id for game in self.pending_games]
+        }
@@ -0,0 +1,125 @@
+# ==================================================
+#              bitmask graph utilities
+# ==================================================
+
+# convert an adjacency matrix into one integer bitmask per team
+# bit j of wins[i] is set if team i beat team j
+def to_bitmasks(adj_matrix):
+    wins = []
+    for row in adj_matrix:
+        mask = 0
+        for j, value in enumerate(row):
+            if value:
+                mask |= 1 << j
+        wins.append(mask)
+    return wins
+
+# flip every edge, bit j of losses[i] is set if team j beat team i
+def transpose(wins):
+    losses = [0] * len(wins)
+    for i, mask in enumerate(wins):
+        while mask:
+            low = mask & -mask
+            losses[low.bit_length() - 1] |= 1 << i
+            mask ^= low
+    return losses
+
+# iterate over the indices of the set bits of mask, lowest first
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def lowest_bit(mask):
+    return (mask & -mask).bit_length() - 1
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+# true if every consecutive pair in sequence also has an edge the other way,
+# meaning the reversed sequence is a valid path too
+def reverse_exists(sequence, wins):
+    for i in range(len(sequence) - 1):
+        if not wins[sequence[i + 1]] >> sequence[i] & 1:
+            return False
+    return True
+
+# every pair of teams has played at least once (a tournament, or a tournament
+# where some pairs split their games)
+def is_semicomplete(wins):
+    full = (1 << len(wins)) - 1
+    losses = transpose(wins)
+    for team in range(len(wins)):
+        if wins[team] | losses[team] | (1 << team) != full:
+            return False
+    return True
+
+# ==================================================
+#            strongly connected components
+# ==================================================
+
+# kosaraju's algorithm over the bitmask adjacency
+# returns the components as bitmasks in topological order, so no team in a
+# component ever lost to a team in a later component
+def strongly_connected_components(wins):
+    num_teams = len(wins)
+    losses = transpose(wins)
+
+    # first pass: order teams by dfs finishing time following wins
+    order = []
+    unvisited = (1 << num_teams) - 1
+    for root in range(num_teams):
+        if not unvisited >> root & 1:
+            continue
+        unvisited ^= 1 << root
+        stack = [root]
+        while stack:
+            unexplored = wins[stack[-1]] & unvisited
+            if unexplored:
+                low = unexplored & -unexplored
+                unvisited ^= low
+                stack.append(low.bit_length() - 1)
+            else:
+                order.append(stack.pop())
+
+    # second pass: follow losses in reverse finishing order, every search
+    # collects exactly one component
+    components = []
+    unvisited = (1 << num_teams) - 1
+    for root in reversed(order):
+        if not unvisited >> root & 1:
+            continue
+        unvisited ^= 1 << root
+        component = frontier = 1 << root
+        while frontier:
+            low = frontier & -frontier
+            frontier ^= low
+            new = losses[low.bit_length() - 1] & unvisited
+            unvisited ^= new
+            component |= new
+            frontier |= new
+        components.append(component)
+
+    return components
+
+def is_strongly_connected(wins):
+    return len(strongly_connected_components(wins)) == 1
+
+# collapse every strongly connected component into a single node
+# returns the components as lists of team indices in topological order and
+# the set of (i, j) pairs where a team in component i beat a team in component j
+def condensation(wins):
+    components = strongly_connected_components(wins)
+    component_of = {}
+    for i, component in enumerate(components):
+        for team in bits(component):
+            component_of[team] = i
+
+    component_edges = set()
+    for team, mask in enumerate(wins):
+        for opponent in bits(mask):
+            if component_of[team] != component_of[opponent]:
+                component_edges.add((component_of[team], component_of[opponent]))
+
+    return [list(bits(component)) for component in components], component_edges
@@ -1,74 +1,207 @@
+import heapq
+import json
+import time
 from anytree import PreOrderIter
-from algorithm.data import PotentialCircleOfSuck, GroupNode, TeamNode, Game
-
-# check for any winless or undefeated teams
-def hamiltonian_sufficiency_check(matrix):
-    def has_win_and_loss(arr):
-        has_one = False
-        has_zero = False
-        for value in arr:
-            if value == 1:
-                has_one = True
-            elif value == 0:
-                has_zero = True
-            if has_one and has_zero:
-                return True
-        return False
-
-    for row in matrix:
-        if not has_win_and_loss(row):
-            return False
-    for col in range(len(matrix[0])):
-        column = [matrix[row][col] for row in range(len(matrix))]
-        if not has_win_and_loss(column):
-            return False
-    return True
-    
-def find_all_hamiltonian_cycles(adj_matrix):
-    if hamiltonian_sufficiency_check(adj_matrix) is False:
+from algorithm.data import PotentialCircleOfSuck, GroupNode, TeamNode
+from algorithm.graph import to_bitmasks, transpose, bits, reverse_exists, is_strongly_connected, condensation
+from algorithm.circle_of_suck import describe_condensation, feasible_endpoints
+
+# edge states of the potential circle of suck graph
+EDGE_ABSENT = 0
+EDGE_DECIDED = 1
+EDGE_PENDING = 2
+
+# lazily yields every hamiltonian cycle through team 0, skipping a cycle if
+# its mirror image is also a valid cycle and has already been yielded
+# stops after limit cycles or once time.monotonic() passes deadline
+def find_all_hamiltonian_cycles(adj_matrix, limit=None, deadline=None):
+    num_teams = len(adj_matrix)
+    if num_teams < 2:
+        return
+
+    # every team must be able to reach every other team through wins
+    wins = to_bitmasks(adj_matrix)
+    if not is_strongly_connected(wins):
+        return
+
+    full = (1 << num_teams) - 1
+
+    # dead[visited] is a bitmask of endpoints from which no path through the
+    # remaining teams closes a cycle, so those states are never explored again
+    dead = {}
+
+    # stack[i] holds the untried candidates after path[i] and found[i] whether
+    # any cycle was completed below path[i]
+    path = [0]
+    visited = 1
+    stack = [wins[0] & (full ^ visited)]
+    found = [False]
+    count = 0
+    steps = 0
+
+    while stack:
+        steps += 1
+        if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+            return
+
+        # backtrack once every candidate has been tried
+        if not stack[-1]:
+            stack.pop()
+            node = path.pop()
+            if found.pop():
+                if found:
+                    found[-1] = True
+            else:
+                dead[visited] = dead.get(visited, 0) | (1 << node)
+            visited ^= 1 << node
+            continue
+
+        low = stack[-1] & -stack[-1]
+        stack[-1] ^= low
+        next_node = low.bit_length() - 1
+        next_visited = visited | low
+
+        # skip states already known to be dead ends
+        if dead.get(next_visited, 0) & low:
+            continue
+
+        # every team visited, close the cycle if next_node beat team 0
+        if next_visited == full:
+            if wins[next_node] & 1:
+                found[-1] = True
+                cycle = path + [next_node, 0]
+
+                # the mirror of a cycle starts with the second to last team
+                if cycle[1] > cycle[-2] and reverse_exists(cycle, wins):
+                    continue
+                yield cycle
+
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            continue
+
+        path.append(next_node)
+        visited = next_visited
+        stack.append(wins[next_node] & (full ^ visited))
+        found.append(False)
+
+# write each item as one json line as it is generated, so any number of
+# cycles can be written in bounded memory
+# returns the number of items written
+def write_jsonl(items, path):
+    count = 0
+    with open(path, 'w') as file:
+        for item in items:
+            file.write(json.dumps(item) + '\n')
+            count += 1
+    return count
+
+# ranks potential circles of suck by the number of pending results they need
+# the cycle needing the fewest is found exactly by find_fewest_pending_cycle,
+# the rest of the ranking is filled from the streamed cycles, both until deadline
+# returns up to limit (pending count, cycle) pairs, fewest pending first, and
+# nothing if the exact search did not finish in time
+def rank_potential_cycles(adj_matrix, limit=10, deadline=None):
+    best = find_fewest_pending_cycle(adj_matrix, deadline)
+    if best is None:
         return []
 
-    memo = {}
-    path = []
-    all_cycles = []
+    def pending_count(cycle):
+        return sum(1 for i in range(len(cycle) - 1) if adj_matrix[cycle[i]][cycle[i + 1]] == EDGE_PENDING)
 
-    def visit(node, visited):
-        # base case:
-        # if all nodes are visited
-        if visited == (1 << len(adj_matrix)) - 1:
-            # and if there's an edge back to the start node
-            if adj_matrix[node][0] == 1:
-                # valid cycle found, add the first node to complete the cycle
-                all_cycles.append(path[:] + [0])
-            return  # continue searching for other cycles
+    # max heap of the best cycles so far, bounded by limit
+    ranked = [(-pending_count(best), 0, best)]
+    for i, cycle in enumerate(find_all_hamiltonian_cycles(adj_matrix, deadline=deadline), start=1):
+        # the stream yields only one orientation of a cycle, which may be best's mirror
+        if cycle == best or cycle == best[::-1]:
+            continue
+        item = (-pending_count(cycle), i, cycle)
+        if len(ranked) < limit:
+            heapq.heappush(ranked, item)
+        elif item > ranked[0]:
+            heapq.heapreplace(ranked, item)
 
-        # get result if already cached
-        if (node, visited) in memo:
-            return memo[(node, visited)]
+    return [(-pending, cycle) for pending, _, cycle in sorted(ranked, reverse=True)]
 
-        # explore possible next nodes
-        for next_node in range(len(adj_matrix)):
-            # if next_node is connected to node and not yet visited
-            if adj_matrix[node][next_node] == 1 and not (visited & (1 << next_node)):
-                path.append(next_node)
+# held-karp where every pending edge costs one and decided edges are free
+# returns the cycle through every team needing the fewest pending results,
+# returns None if no cycle exists even if every pending game goes our way, or
+# once time.monotonic() passes deadline
+def find_fewest_pending_cycle(adj_matrix, deadline=None):
+    num_teams = len(adj_matrix)
+    if num_teams < 2:
+        return None
 
-                # recursive step: explore from next_node
-                visit(next_node, visited | (1 << next_node))
+    wins = to_bitmasks(adj_matrix)
+    if not is_strongly_connected(wins):
+        return None
 
-                # backtrack
-                path.pop()
+    # levels[k] maps every subset of k + 1 teams covered by a path from team 0
+    # to {endpoint: fewest pending edges on such a path}, keeping only the
+    # endpoints feasible_endpoints cannot rule out
+    full = (1 << num_teams) - 1
+    losses = transpose(wins)
+    levels = [{1: {0: 0}}]
+    steps = 0
+    for _ in range(num_teams - 1):
+        frontier = {}
+        for subset, endpoints in levels[-1].items():
+            steps += 1
+            if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+                return None
+            for endpoint, cost in endpoints.items():
+                for next_node in bits(wins[endpoint] & (full ^ subset)):
+                    next_cost = cost + (adj_matrix[endpoint][next_node] == EDGE_PENDING)
+                    next_endpoints = frontier.setdefault(subset | (1 << next_node), {})
+                    if next_cost < next_endpoints.get(next_node, num_teams + 1):
+                        next_endpoints[next_node] = next_cost
 
-        # cache the exploration result (not used for early termination now)
-        memo[(node, visited)] = False
+        # drop the endpoints that can no longer close a cycle
+        pruned = {}
+        for subset, endpoints in frontier.items():
+            steps += 1
+            if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+                return None
+            mask = 0
+            for endpoint in endpoints:
+                mask |= 1 << endpoint
+            feasible = feasible_endpoints(wins, losses, full, subset, mask, 0)
+            if feasible:
+                pruned[subset] = {endpoint: cost for endpoint, cost in endpoints.items() if feasible >> endpoint & 1}
+        if not pruned:
+            return None
+        levels.append(pruned)
 
-    # start search with node 0
+    # close the cycle back to team 0 as cheaply as possible
+    closing = {
+        endpoint: cost + (adj_matrix[endpoint][0] == EDGE_PENDING)
+        for endpoint, cost in levels[-1].get(full, {}).items()
+        if wins[endpoint] & 1
+    }
+    if not closing:
+        return None
+
+    # walk back choosing any predecessor that accounts for the cost
+    node = min(closing, key=closing.get)
+    cost = closing[node] - (adj_matrix[node][0] == EDGE_PENDING)
+    subset = full
+    path = [0, node]
+    for level in range(len(levels) - 2, 0, -1):
+        subset ^= 1 << node
+        for previous, previous_cost in levels[level][subset].items():
+            if adj_matrix[previous][node] and previous_cost + (adj_matrix[previous][node] == EDGE_PENDING) == cost:
+                node, cost = previous, previous_cost
+                break
+        path.append(node)
     path.append(0)
-    visit(0, 1 << 0)
+    path.reverse()
 
-    return all_cycles
+    return path
 
 def extract_games(root):
     games = []
+    upcoming_games = []
     teams = []
     for node in PreOrderIter(root):
         if len(node.children) == 0:
@@ -76,71 +209,74 @@ def extract_games(root):
         else:
             for game in node.games:
                 games.append(game)
-            for game in node.upcoming_games: 
-                home_win = Game(
-                    game.id,
-                    game.date,
-                    game.week,
-                    game.home_team,
-                    game.away_team,
-                    0,
-                    0,
-                    True
-                )
-                away_win = Game(
-                    game.id,
-                    game.date,
-                    game.week,
-                    game.home_team,
-                    game.away_team,
-                    0,
-                    0,
-                    False
-                )
-                games.append(home_win)
-                games.append(away_win)
-    return games, teams
-
-def construct_graph(games, teams):
+            for game in node.upcoming_games:
+                upcoming_games.append(game)
+    return games, upcoming_games, teams
+
+# builds a matrix of edge states instead of one Game per hypothetical result:
+# EDGE_DECIDED if the winner already beat the loser, EDGE_PENDING if they have
+# an upcoming game, EDGE_ABSENT otherwise
+def construct_graph(games, upcoming_games, teams):
     # create mapping to keep track of which team corresponds to each index
     team_to_index = {team.name: i for i, team in enumerate(teams)}
 
-    # initialize zero-filled 2D array and set of edges
+    # initialize absent-filled 2D array and set of edges
     num_teams = len(teams)
-    adj_matrix = [[0] * num_teams for _ in range(num_teams)]
+    adj_matrix = [[EDGE_ABSENT] * num_teams for _ in range(num_teams)]
     edges = {}
 
     for game in games:
         home_index = team_to_index[game.home_team.name]
         away_index = team_to_index[game.away_team.name]
         
-        if game.home_team_won == 'true':
+        if game.home_team_won == True:
             winner_index = home_index
             loser_index = away_index
         else:
             winner_index = away_index
             loser_index = home_index
         
-        adj_matrix[winner_index][loser_index] = 1
+        adj_matrix[winner_index][loser_index] = EDGE_DECIDED
         edges[(winner_index, loser_index)] = game
 
+    # an upcoming game can go either way, but never replaces a decided result
+    for game in upcoming_games:
+        home_index = team_to_index[game.home_team.name]
+        away_index = team_to_index[game.away_team.name]
+
+        for winner_index, loser_index in ((home_index, away_index), (away_index, home_index)):
+            if adj_matrix[winner_index][loser_index] == EDGE_ABSENT:
+                adj_matrix[winner_index][loser_index] = EDGE_PENDING
+                edges[(winner_index, loser_index)] = game
+
     return adj_matrix, edges
 
-# function to find potential circle of suck from a league hierarchy tree decorated with games
-# returns CircleOfSuck if circle of suck is found, returns None if no circle of suck found
-def resuck(root, finished_game_ids):
-    games, teams = extract_games(root)
-    adjacency_matrix, edges = construct_graph(games, teams)
-    circles_of_suck = find_all_hamiltonian_cycles(adjacency_matrix)
+# function to find potential circles of suck from a league hierarchy tree decorated with games
+# ranks potential circles of suck by the number of pending results they need, searching
+# for more candidates until deadline, and writes them to output_path as json lines if given
+# returns up to limit PotentialCircleOfSuck, fewest pending results first
+def resuck(root, finished_game_ids, limit=10, deadline=None, output_path=None):
+    games, upcoming_games, teams = extract_games(root)
+    adjacency_matrix, edges = construct_graph(games, upcoming_games, teams)
 
+    # reject groups that split into teams that can never lose to the rest
     print(root.name)
-    if len(circles_of_suck) > 0:
-        group_name = root.name
-        for potential_circle_of_suck in circles_of_suck:
-            circle_of_suck = PotentialCircleOfSuck(group_name, potential_circle_of_suck, edges, teams, finished_game_ids)
-            print("Potential Circle of Suck")
-            print(circle_of_suck)
-    else:
+    components, _ = condensation(to_bitmasks(adjacency_matrix))
+    if len(components) > 1:
+        print(describe_condensation(components, teams))
+        print("Unable to find Potential Circle of Suck\n")
+        return []
+
+    potential_circles_of_suck = []
+    for pending, cycle in rank_potential_cycles(adjacency_matrix, limit, deadline):
+        circle_of_suck = PotentialCircleOfSuck(root.name, cycle, edges, teams, finished_game_ids)
+        print(f"Potential Circle of Suck ({pending} pending)")
+        print(circle_of_suck)
+        potential_circles_of_suck.append(circle_of_suck)
+
+    if len(potential_circles_of_suck) == 0:
         print("Unable to find Potential Circle of Suck\n")
-    
-    return circle_of_suck
\ No newline at end of file
+    elif output_path is not None:
+        write_jsonl((circle_of_suck.to_dict() for circle_of_suck in potential_circles_of_suck), output_path)
+
+    return potential_circles_of_suck
@@ -1,16 +1,21 @@
 import os
-import requests
+import argparse
+import asyncio
 import json
 import pickle
-from datetime import datetime, timezone
-from anytree import RenderTree
-from anytree.util import commonancestors
+import time
+from datetime import datetime, timedelta, timezone
+from anytree import RenderTree, PreOrderIter
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from algorithm.data import Tree, GroupNode, TeamNode, Game, UpcomingGame
-from algorithm.circle_of_suck import suck
+from algorithm.data import Tree, GroupNode, TeamNode, Game, UpcomingGame, LeagueGraph, path_id
+from algorithm.circle_of_suck import suck, suck_incremental, suck_parallel, suck_batch, BATCH_LIMIT
 from algorithm.potential_circle_of_suck import resuck
+from fetch import Fetcher
+from cache import ResponseCache
+from store import GameStore
+from suck_tree import SuckTree
 
 # ==================================================
 #                 utility functions
@@ -19,6 +24,29 @@ from algorithm.potential_circle_of_suck import resuck
 def pretty_print(data):
     print(json.dumps(data, indent=4))
 
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%dT%H:%MZ").date()
+
+# schedules give scores as {'value': 24.0, 'displayValue': '24'}, scoreboards as '24'
+def parse_score(score):
+    if isinstance(score, dict):
+        return int(score['value'])
+    return int(score)
+
+# schedules label weeks with text, scoreboards only number them
+def event_week(event):
+    if 'week' not in event:
+        return '0'
+    if 'text' in event['week']:
+        return event['week']['text']
+    return f"Week {event['week']['number']}"
+
+class ScoreboardOverflow(Exception):
+    def __init__(self, date, limit):
+        super().__init__(f'the scoreboard for {date:%Y%m%d} holds {limit} games or more, more than one request can return')
+        self.date = date
+        self.limit = limit
+
 def todays_date_in_range(item):
     start_date_str = item['startDate']
     end_date_str = item['endDate']
@@ -28,36 +56,65 @@ def todays_date_in_range(item):
 
     return start_date <= current_date <= end_date
 
-def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
+def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = '', WORKERS = 1, OFFLINE = False, INGEST_MODE = 'schedule', LOW_MEMORY = False, SCOREBOARD_GROUP = ''):
 
     # ==================================================
     #                    API calls
     # ==================================================
 
     PAGE_SIZE = 1000
-    BASE_URL = 'https://site.api.espn.com/apis/site/v2/sports'
-    CORE_URL = 'https://sports.core.api.espn.com/v2/sports'
+    EXACT_SEARCH_LIMIT = 50
+    HEURISTIC_TIME_BUDGET = 60
+    CONCURRENCY = 16
+    # sources a first scrape ingests between checkpoints
+    CHECKPOINT_SIZE = 4 * CONCURRENCY
+    # both can be pointed at a local stand-in server
+    BASE_URL = os.environ.get('ESPN_BASE_URL', 'https://site.api.espn.com/apis/site/v2/sports')
+    CORE_URL = os.environ.get('ESPN_CORE_URL', 'https://sports.core.api.espn.com/v2/sports')
     BASE_API_URL = f'{BASE_URL}/{SPORT}/{LEAGUE}'
     CORE_API_URL = f'{CORE_URL}/{SPORT}/leagues/{LEAGUE}'
 
+    # scoreboard ingest progress for this run, and the dates each scoreboard url covers
+    ingest_state = {'last_date': None, 'next_date': None}
+    scoreboard_windows = {}
+
+    # every call of this run shares one connection pool and the on-disk cache,
+    # an offline run is served from the cache only
+    fetcher = Fetcher(CONCURRENCY, cache=ResponseCache('data/cache', OFFLINE))
+
     def pure_api_call(api_url):
-        response = requests.get(api_url)
-        response.raise_for_status()
-        return response.json()
+        return fetcher.get_json(api_url)
 
     def base_api_call(params):
         params = '/'.join(params)
         api_url = f'{BASE_API_URL}{params}'
-        response = requests.get(api_url)
-        response.raise_for_status()
-        return response.json()
+        return fetcher.get_json(api_url)
 
     def core_api_call(params):
         params = '/'.join(params)
         api_url = f'{CORE_API_URL}{params}'
-        response = requests.get(api_url)
-        response.raise_for_status()
-        return response.json()
+        return fetcher.get_json(api_url)
+
+    # async versions, awaited concurrently while walking the hierarchy
+    async def async_api_call(api_url):
+        return await fetcher.fetch_json(api_url)
+
+    async def async_api_calls(api_urls):
+        return await fetcher.fetch_all(api_urls)
+
+    def schedule_url(team_node):
+        return f'{BASE_API_URL}/teams/{team_node.id}/schedule?season={SEASON_YEAR}?pageSize={PAGE_SIZE}'
+
+    # college scoreboards only list every game when asked for a group, the league's
+    # group (e.g. /groups/90) unless SCOREBOARD_GROUP names one, as leagues without a
+    # group in their hierarchy need
+    def scoreboard_url(first_date, last_date):
+        api_url = f'{BASE_API_URL}/scoreboard?dates={first_date:%Y%m%d}-{last_date:%Y%m%d}&limit={PAGE_SIZE}'
+        group = SCOREBOARD_GROUP or GROUP_EXTENSION.split('/')[-1]
+        if group:
+            api_url += f'&groups={group}'
+        scoreboard_windows[api_url] = (first_date, last_date)
+        return api_url
 
     # ==================================================
     #                   Data Scraping
@@ -80,27 +137,26 @@ def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
             return 0
 
     # recursive function to collect league hierarchy
-    def construct_tree(root, root_response, groups_dict, teams_dict = {}):
-        if 'groups' in root_response:
-            groups_response = pure_api_call(root_response['groups']['$ref'])
-            for item in groups_response['items']:
-                item_response = pure_api_call(item['$ref'])
-                group_node = GroupNode(item_response['name'], item_response['abbreviation'] if 'abbreviation' in item_response else None, root)
-                groups_dict[group_node.name] = group_node
-                construct_tree(group_node, item_response, groups_dict, teams_dict)
-        elif 'children' in root_response:
-            print("Scraping", root_response['name'] + '...')
-            children_response = pure_api_call(root_response['children']['$ref'])
-            for item in children_response['items']:
-                item_response = pure_api_call(item['$ref'])
-                group_node = GroupNode(item_response['name'], item_response['abbreviation'] if 'abbreviation' in item_response else None, root)
-                groups_dict[group_node.name] = group_node
-                construct_tree(group_node, item_response, groups_dict, teams_dict)
+    # every level of the hierarchy and every group's subtree is fetched concurrently
+    async def construct_tree(root, root_response, groups_dict, teams_dict = {}):
+        if 'groups' in root_response or 'children' in root_response:
+            if 'groups' in root_response:
+                items_response = await async_api_call(root_response['groups']['$ref'])
+            else:
+                print("Scraping", root_response['name'] + '...')
+                items_response = await async_api_call(root_response['children']['$ref'])
+            item_responses = await async_api_calls([item['$ref'] for item in items_response['items']])
+            subtrees = []
+            for item_response in item_responses:
+                group_node = GroupNode(item_response['name'], item_response['abbreviation'] if 'abbreviation' in item_response else None, root, item_response.get('id'))
+                groups_dict[group_node.id] = group_node
+                subtrees.append(construct_tree(group_node, item_response, groups_dict, teams_dict))
+            await asyncio.gather(*subtrees)
         else:
             print("Scraping", root_response['name'] + '...')
-            teams_list = pure_api_call(root_response['teams']['$ref'])
-            for team_response in teams_list['items']:
-                team = pure_api_call(team_response['$ref'] + '?pageSize={PAGE_SIZE}')
+            teams_list = await async_api_call(root_response['teams']['$ref'])
+            team_responses = await async_api_calls([team_response['$ref'] + '?pageSize={PAGE_SIZE}' for team_response in teams_list['items']])
+            for team in team_responses:
                 team_node = TeamNode(
                     team['id'],
                     team['displayName'],
@@ -111,79 +167,152 @@ def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
                 teams_dict[team['id']] = team_node
         return root, teams_dict, groups_dict
 
-    # adds game info to lowest common ancestor group node for the two teams
-    def insert_game(game_info, groups_dict):
-        home_team = game_info.home_team
-        away_team = game_info.away_team
-        group_name = commonancestors(home_team, away_team)[-1].name
-        group_node = groups_dict[group_name]
-        group_node.games.add(game_info)
-
-    # adds upcoming game info to lowest common ancestor group node for the two teams
-    def insert_upcoming_game(game_info, groups_dict):
-        home_team = game_info.home_team
-        away_team = game_info.away_team
-        group_name = commonancestors(home_team, away_team)[-1].name
-        group_node = groups_dict[group_name]
-        group_node.upcoming_games.add(game_info)
-
-    def decorate_tree(root, groups_dict, teams_dict, SEASON_YEAR, finished_games_ids = set(), upcoming_games_ids = set()):
+    # adds one event from a schedule or scoreboard to the tree, unless it was previously scraped
+    # league is the LeagueGraph the game is added to
+    def ingest_event(event, league, teams_dict, current_week, finished_games_ids, upcoming_games_ids):
+        # check if game was previously scraped
+        if event['id'] in finished_games_ids or event['id'] in upcoming_games_ids:
+            return
+
+        home_id = event['competitions'][0]['competitors'][0]['id']
+        away_id = event['competitions'][0]['competitors'][1]['id']
+        week = event_week(event)
+
+        # get games from upcoming week
+        if not event['competitions'][0]['status']['type']['completed']:
+
+            if week == current_week and home_id in teams_dict and away_id in teams_dict:
+
+                upcoming_games_ids.add(event['id'])
+
+                # collect game info
+                game_info = UpcomingGame(
+                    event['id'],
+                    event['date'],
+                    week,
+                    teams_dict[home_id],
+                    teams_dict[away_id],
+                )
+                league.add_upcoming_game(game_info)
+
+        # skip this game if we do not have info for one of the teams
+        if home_id not in teams_dict or away_id not in teams_dict or 'score' not in event['competitions'][0]['competitors'][0] or 'score' not in event['competitions'][0]['competitors'][1] or 'winner' not in event['competitions'][0]['competitors'][0] or 'winner' not in event['competitions'][0]['competitors'][1]:
+            return
+        # skip this game if it is not yet complete
+        if 'status' not in event['competitions'][0] or not event['competitions'][0]['status']['type']['completed']:
+            return
+        finished_games_ids.add(event['id'])
+
+        # collect game info and results
+        game_info = Game(
+            event['id'],
+            event['date'],
+            week,
+            teams_dict[home_id],
+            teams_dict[away_id],
+            parse_score(event['competitions'][0]['competitors'][0]['score']),
+            parse_score(event['competitions'][0]['competitors'][1]['score']),
+            event['competitions'][0]['competitors'][0]['winner']
+        )
+        league.add_game(game_info)
+
+    # every team's schedule, each game shows up once per team
+    def schedule_sources(teams_dict):
+        return [(team_node.name, schedule_url(team_node)) for team_node in teams_dict.values()]
+
+    # the league scoreboard, one request per week of dates since the last successful
+    # ingest (or since the season started), up to a week from today
+    def scoreboard_sources():
+        season_response = fetch_season()
+        season_start = parse_date(season_response['startDate'])
+        season_end = parse_date(season_response['endDate'])
+        today = datetime.now(timezone.utc).date()
+
+        # scoreboard dates are local, so the day before the cursor is fetched again
+        start = season_start
+        if ingest_state['last_date'] is not None:
+            start = max(season_start, ingest_state['last_date'] - timedelta(days=1))
+        end = min(season_end, today + timedelta(days=7))
+
+        # the next ingest picks up from today, unless an earlier game is not yet complete
+        ingest_state['next_date'] = today
+
+        sources = []
+        while start <= end:
+            last = min(start + timedelta(days=6), end)
+            sources.append((f'scoreboard {start:%Y%m%d}-{last:%Y%m%d}', scoreboard_url(start, last)))
+            start += timedelta(days=7)
+        return sources
+
+    # a scoreboard response with PAGE_SIZE events may have been cut off, so its dates
+    # are fetched again in two halves until every response has room to spare
+    # a single day that still fills a page cannot be split and raises ScoreboardOverflow
+    def complete_scoreboard(api_url, events):
+        if len(events) < PAGE_SIZE:
+            return events
+        first_date, last_date = scoreboard_windows[api_url]
+        if first_date == last_date:
+            raise ScoreboardOverflow(first_date, PAGE_SIZE)
+
+        middle = first_date + timedelta(days=(last_date - first_date).days // 2)
+        halves = [scoreboard_url(first_date, middle), scoreboard_url(middle + timedelta(days=1), last_date)]
+        responses = asyncio.run(async_api_calls(halves))
+        return [event for half, response in zip(halves, responses) for event in complete_scoreboard(half, response['events'])]
+
+    # hold the scoreboard cursor back to the first game that is not yet complete,
+    # so postponed games are not lost
+    def advance_cursor(events):
+        for event in events:
+            event_date = parse_date(event['date'])
+            if event_date < ingest_state['next_date'] and not event['competitions'][0]['status']['type']['completed']:
+                ingest_state['next_date'] = event_date
+
+    # with progress, sources are fetched CHECKPOINT_SIZE at a time and the progress is
+    # saved after each batch, sources it already lists are skipped
+    def decorate_tree(root, groups_dict, teams_dict, SEASON_YEAR, finished_games_ids = set(), upcoming_games_ids = set(), progress = None, save_progress = None, league = None):
         current_week = fetch_current_week()
+        if league is None:
+            league = LeagueGraph(root)
 
-        # for each team in our league hierarchy
-        for name, team_node in teams_dict.items():
-            print("Scraping", team_node.name + '...')
-            
-            # fetch team's schedule
-            response = base_api_call([f'/teams/{team_node.id}/schedule?season={SEASON_YEAR}?pageSize={PAGE_SIZE}'])
-            team_schedule = response['events']
-            for event in team_schedule:
-
-                # check if game was previously scraped
-                if event['id'] not in finished_games_ids and event['id'] not in upcoming_games_ids:
-
-                    # get games from upcoming week
-                    if not event['competitions'][0]['status']['type']['completed']:
-
-                        if 'week' in event and event['week']['text'] == current_week:
-
-                            upcoming_games_ids.add(event['id'])
-
-                            # collect game info and results
-                            home_id = event['competitions'][0]['competitors'][0]['id']
-                            away_id = event['competitions'][0]['competitors'][1]['id']
-
-                            game_info = UpcomingGame(
-                                event['id'],
-                                event['date'],
-                                event['week']['text'] if 'week' in event else '0',
-                                teams_dict[home_id],
-                                teams_dict[away_id],
-                            )
-                            insert_upcoming_game(game_info, groups_dict)
-                    
-                    # skip this game if we do not have info for one of the teams
-                    home_id = event['competitions'][0]['competitors'][0]['id']
-                    away_id = event['competitions'][0]['competitors'][1]['id']
-                    if home_id not in teams_dict or away_id not in teams_dict or 'score' not in event['competitions'][0]['competitors'][0] or 'score' not in event['competitions'][0]['competitors'][1] or 'winner' not in event['competitions'][0]['competitors'][0] or 'winner' not in event['competitions'][0]['competitors'][1]:
-                        continue
-                    # skip this game if it is not yet complete
-                    if 'status' not in event['competitions'][0] or not event['competitions'][0]['status']['type']['completed']:
-                        continue
-                    finished_games_ids.add(event['id'])
-
-                    # collect game info and results
-                    game_info = Game(
-                        event['id'],
-                        event['date'],
-                        event['week']['text'] if 'week' in event else '0',
-                        teams_dict[home_id],
-                        teams_dict[away_id],
-                        int(event['competitions'][0]['competitors'][0]['score']['value']),
-                        int(event['competitions'][0]['competitors'][1]['score']['value']),
-                        event['competitions'][0]['competitors'][0]['winner']
-                    )
-                    insert_game(game_info, groups_dict)
+        # upcoming games are rebuilt on every pass, a saved tree may hold last week's
+        upcoming_games_ids.clear()
+        for node in PreOrderIter(root):
+            if isinstance(node, GroupNode):
+                node.upcoming_games.clear()
+
+        if INGEST_MODE == 'scoreboard':
+            sources = scoreboard_sources()
+        else:
+            sources = schedule_sources(teams_dict)
+
+        batch_size = len(sources) or 1
+        if progress is not None:
+            sources = [source for source in sources if source[1] not in progress['scraped_urls']]
+            batch_size = CHECKPOINT_SIZE
+            # a checkpoint saved by the other ingest mode has no cursor, or this run has none
+            if progress['next_date'] is not None and ingest_state['next_date'] is not None:
+                ingest_state['next_date'] = min(ingest_state['next_date'], progress['next_date'])
+
+        for start in range(0, len(sources), batch_size):
+            batch = sources[start:start + batch_size]
+
+            # fetch the batch concurrently
+            responses = asyncio.run(async_api_calls([url for _, url in batch]))
+
+            for (name, url), response in zip(batch, responses):
+                print("Scraping", name + '...')
+                events = response['events']
+                if INGEST_MODE == 'scoreboard':
+                    events = complete_scoreboard(url, events)
+                for event in events:
+                    ingest_event(event, league, teams_dict, current_week, finished_games_ids, upcoming_games_ids)
+                if INGEST_MODE == 'scoreboard':
+                    advance_cursor(events)
+
+            if progress is not None:
+                progress['scraped_urls'].update(url for _, url in batch)
+                progress['next_date'] = ingest_state['next_date']
+                save_progress(progress)
 
         return root, finished_games_ids
 
@@ -193,29 +322,97 @@ def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
 
     def fetch_tree(season_type = 2):
 
-        def load_tree(tree_path):
+        # date of the last successful scoreboard ingest, saved alongside the tree
+        def load_ingest_state(ingest_path):
+            if os.path.exists(ingest_path):
+                with open(ingest_path, 'r') as file:
+                    ingest_state['last_date'] = datetime.strptime(json.load(file)['last_date'], '%Y-%m-%d').date()
+
+        def save_ingest_state(ingest_path):
+            if ingest_state['next_date'] is not None:
+                ingest_state['last_date'] = ingest_state['next_date']
+                with open(ingest_path, 'w') as file:
+                    json.dump({'last_date': ingest_state['last_date'].isoformat()}, file)
+
+        # every finished game in the tree, read from the tree itself so no group
+        # is missed even if two of them ever share a key in groups_dict
+        def tree_games(root):
+            return [game for node in PreOrderIter(root) if isinstance(node, GroupNode) for game in node.games]
+
+        def load_tree(store):
+            tree, teams_dict, groups_dict, games = store.load()
+            league = LeagueGraph(tree)
+            for game in games:
+                league.add_game(game)
+            return tree, teams_dict, groups_dict, {game.id for game in games}, league
+
+        # a tree.pkl from before the game store, read once to fill a new store
+        def load_pickled_tree(tree_path):
             with open(tree_path, 'rb') as file:
                 tree = pickle.load(file)
                 teams_dict = pickle.load(file)
                 groups_dict = pickle.load(file)
                 finished_game_ids = pickle.load(file)
-                return tree, teams_dict, groups_dict, finished_game_ids
-
-        def make_tree(tree_path):
-            # create root node of tree
-            league_response = core_api_call('')
-            league_name = league_response['name']
-            league_abbreviation = league_response['abbreviation']
-            root = GroupNode(league_name, league_abbreviation, None)
-            groups_dict = {}
-            groups_dict[root.name] = root
 
-            # construct the skeleton of the tree (conferences & teams)
-            root_response = core_api_call([f'/seasons/{SEASON_YEAR}/types/{season_type}{GROUP_EXTENSION}'])
-            tree, teams_dict, groups_dict = construct_tree(root, root_response, groups_dict)
+            # the dicts are pickled apart from the tree, so point them back at its
+            # nodes, groups from before group ids are known by path_id
+            groups_dict = {}
+            for node in PreOrderIter(tree):
+                if isinstance(node, GroupNode):
+                    if not hasattr(node, 'id'):
+                        node.id = path_id(node)
+                    groups_dict[node.id] = node
+                elif isinstance(node, TeamNode):
+                    teams_dict[node.id] = node
+            return tree, teams_dict, groups_dict, finished_game_ids
+
+        # scraping progress of a tree that is still being made: the tree skeleton,
+        # the games ingested so far and the sources they came from
+        def load_progress(progress_path):
+            if not os.path.exists(progress_path):
+                return None
+            with open(progress_path, 'rb') as file:
+                return pickle.load(file)
+
+        # write to a temporary file and rename it, so a crash never leaves half a checkpoint
+        def save_progress(progress_path, progress):
+            with open(f'{progress_path}.tmp', 'wb') as file:
+                pickle.dump(progress, file)
+            os.replace(f'{progress_path}.tmp', progress_path)
+
+        def make_tree(store):
+            # resume an interrupted scrape, the hierarchy responses of one that was
+            # interrupted before its skeleton was saved come from the response cache
+            progress_path = f'{store.directory}/scrape_progress.pkl'
+            progress = load_progress(progress_path)
+            if progress is not None:
+                print(f"Resuming scrape, {len(progress['scraped_urls'])} sources already ingested...")
+            else:
+                # create root node of tree
+                league_response = core_api_call('')
+                league_name = league_response['name']
+                league_abbreviation = league_response['abbreviation']
+                root = GroupNode(league_name, league_abbreviation, None, league_response.get('id'))
+                groups_dict = {}
+                groups_dict[root.id] = root
+
+                # construct the skeleton of the tree (conferences & teams)
+                root_response = core_api_call([f'/seasons/{SEASON_YEAR}/types/{season_type}{GROUP_EXTENSION}'])
+                tree, teams_dict, groups_dict = asyncio.run(construct_tree(root, root_response, groups_dict))
+
+                progress = {
+                    'tree': tree,
+                    'teams_dict': teams_dict,
+                    'groups_dict': groups_dict,
+                    'finished_game_ids': set(),
+                    'scraped_urls': set(),
+                    'next_date': None,
+                }
+                save_progress(progress_path, progress)
+            tree, teams_dict, groups_dict = progress['tree'], progress['teams_dict'], progress['groups_dict']
 
             # decorate the tree skeleton with game results
-            tree, finished_game_ids = decorate_tree(tree, groups_dict, teams_dict, SEASON_YEAR)
+            tree, finished_game_ids = decorate_tree(tree, groups_dict, teams_dict, SEASON_YEAR, progress['finished_game_ids'], set(), progress, lambda progress: save_progress(progress_path, progress))
             
             # print the tree (debug purposes)
             print('Tree:')
@@ -234,12 +431,9 @@ def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
                     for item in node.games:
                         print(item)
 
-            # save the tree
-            with open(tree_path, 'wb') as file:
-                pickle.dump(tree, file)
-                pickle.dump(teams_dict, file)
-                pickle.dump(groups_dict, file)
-                pickle.dump(finished_game_ids, file)
+            store.create(tree, teams_dict)
+            store.append(tree_games(tree))
+            os.remove(progress_path)
 
         # create data subdirectories if they don't already exist
         directory_path = f'data/{LEAGUE}/{SEASON_YEAR}'
@@ -247,79 +441,126 @@ def bot(SPORT, LEAGUE, SEASON_YEAR, SEASON_TYPE, GROUP_EXTENSION = ''):
             os.makedirs(directory_path)
 
         # if tree has not yet been constructed for this season
+        store = GameStore(directory_path)
         tree_path = f'{directory_path}/tree.pkl'
-        if not os.path.exists(tree_path):
-            make_tree(tree_path)
+        ingest_path = f'{directory_path}/ingest.json'
+        if not store.exists():
+            if os.path.exists(tree_path):
+                tree, teams_dict, groups_dict, finished_game_ids = load_pickled_tree(tree_path)
+                store.create(tree, teams_dict)
+                store.append(tree_games(tree))
+            else:
+                make_tree(store)
+                save_ingest_state(ingest_path)
+        load_ingest_state(ingest_path)
 
-        tree, teams_dict, groups_dict, finished_game_ids = load_tree(tree_path)
+        tree, teams_dict, groups_dict, finished_game_ids, league = load_tree(store)
+        stored_game_ids = set(finished_game_ids)
 
-        tree, finished_game_ids = decorate_tree(tree, groups_dict, teams_dict, SEASON_YEAR, finished_game_ids)
+        tree, finished_game_ids = decorate_tree(tree, groups_dict, teams_dict, SEASON_YEAR, finished_game_ids, league=league)
 
-        return Tree(tree, teams_dict, groups_dict, finished_game_ids)
+        # keep the games finished since the last run
+        store.append([game for game in tree_games(tree) if game.id not in stored_game_ids])
+        if INGEST_MODE == 'scoreboard':
+            save_ingest_state(ingest_path)
+
+        return Tree(tree, teams_dict, groups_dict, finished_game_ids, league)
 
     def find_circles_of_suck(tree):
 
-        def save_circle_of_suck(circle_of_suck):
-            # add league to suck tree
-            if SPORT not in suck_tree:
-                suck_tree[SPORT] = {}
-            suck_subtree = suck_tree[SPORT]
-            if str(SEASON_YEAR) not in suck_subtree:
-                suck_subtree[str(SEASON_YEAR)] = {}
-            suck_subtree = suck_subtree[str(SEASON_YEAR)]
-            for group in list(group_node.path):
-                if group.name not in suck_subtree:
-                    suck_subtree[group.name] = {}
-                suck_subtree = suck_subtree[group.name]
-            suck_subtree['suck'] = circle_of_suck.to_dict()
-
-            with open(suck_tree_path, 'w') as file:
-                json.dump(suck_tree, file, indent=4)
-        
-        # open suck tree
-        suck_tree_path = 'data/suck_tree.json'
-        with open(suck_tree_path, 'r') as file:
-            suck_tree = json.load(file)
-
-        for name, group_node in tree.groups.items():
-            if len(group_node.leaves) < 50:
-                # if circle of suck already exists, break and try next group
-                circle_of_suck_exists = True
-                if SPORT in suck_tree:
-                    if str(SEASON_YEAR) in suck_tree[SPORT]:
-                        current_item = suck_tree[SPORT][str(SEASON_YEAR)]
-                        for node in list(group_node.path):
-                            if node.name not in current_item:
-                                circle_of_suck_exists = False
-                                break
-                            else:
-                                current_item = current_item[node.name]
-                        if circle_of_suck_exists:
-                            if 'suck' in current_item:
-                                break
-
-                # find if circle of suck exists for this subtree
-                circle_of_suck = suck(group_node)
-
-                # if circle of suck exists
-                if circle_of_suck is not None:
-                    save_circle_of_suck(circle_of_suck)
-
-                # TODO
-                # else if no circle of suck exists
+        # only this sport and season's shard of the suck tree is read, and circles
+        # found are written together once the run is done
+        suck_tree = SuckTree(SPORT, SEASON_YEAR)
+
+        # solver states from the previous run, so unchanged groups are not solved again
+        solver_state_path = f'data/{LEAGUE}/{SEASON_YEAR}/solver_state.pkl'
+        solver_states = {}
+        if os.path.exists(solver_state_path):
+            with open(solver_state_path, 'rb') as file:
+                solver_states = pickle.load(file)
+
+        # collect groups still missing a circle of suck, groups with too many
+        # teams for the exact search only get a time budget for the heuristic
+        # groups where some team never won or never lost inside the group are ruled
+        # out from the degree statistics of the whole league without solving them
+        degree_stats = tree.league.degree_stats()
+        groups = []
+        ruled_out = []
+        for group_id, group_node in tree.groups.items():
+            # if circle of suck already exists, try next group
+            if suck_tree.exists([group.name for group in group_node.path]):
+                continue
+            num_teams, num_games, fewest_wins, fewest_losses = degree_stats[group_node]
+            time_budget = None if num_teams < EXACT_SEARCH_LIMIT else HEURISTIC_TIME_BUDGET
+            if fewest_wins == 0 or fewest_losses == 0:
+                print(group_node.name)
+                print(f"Unable to find Circle of Suck, a team never {'won' if fewest_wins == 0 else 'lost'} within the group\n")
+                ruled_out.append((group_id, group_node, time_budget))
+                continue
+            groups.append((group_id, group_node, time_budget))
+
+        # small groups (most divisions) are all searched together
+        batched = [(group_id, group_node) for group_id, group_node, time_budget in groups if degree_stats[group_node][0] <= BATCH_LIMIT]
+        searched = [group for group in groups if degree_stats[group[1]][0] > BATCH_LIMIT]
+        circles_of_suck, new_solver_states = suck_batch(batched, tree.league)
+        solver_states.update(new_solver_states)
+
+        # find if circle of suck exists for each remaining subtree
+        if WORKERS > 1:
+            new_circles_of_suck, new_solver_states = suck_parallel(searched, solver_states, WORKERS, tree.league, LOW_MEMORY)
+            circles_of_suck.update(new_circles_of_suck)
+            solver_states.update(new_solver_states)
+        else:
+            for group_id, group_node, time_budget in searched:
+                if time_budget is None:
+                    circles_of_suck[group_id], solver_states[group_id] = suck_incremental(group_node, solver_states.get(group_id), tree.league, LOW_MEMORY)
                 else:
-                    # find if potential circle of suck exists for this subtree
-                    potential_circle_of_suck = resuck(group_node, tree.game_ids)
-                    # if potential circles of suck exist
-                        # save potential circles of suck
+                    circles_of_suck[group_id] = suck(group_node, time_budget=time_budget, league=tree.league)
+
+        for group_id, group_node, time_budget in ruled_out:
+            circles_of_suck[group_id] = None
+
+        for group_id, group_node, time_budget in groups + ruled_out:
+            circle_of_suck = circles_of_suck[group_id]
+
+            # if circle of suck exists
+            if circle_of_suck is not None:
+                suck_tree.add([group.name for group in group_node.path], circle_of_suck.to_dict())
+
+            # TODO
+            # else if no circle of suck exists, only for groups small enough for
+            # the exact search, resuck cannot finish on larger ones
+            elif time_budget is None:
+                # find if potential circle of suck exists for this subtree
+                potential_circles_of_suck = resuck(group_node, tree.game_ids, deadline=time.monotonic() + HEURISTIC_TIME_BUDGET)
+                # if potential circles of suck exist
+                    # save potential circles of suck
+
+        suck_tree.flush()
+        with open(solver_state_path, 'wb') as file:
+            pickle.dump(solver_states, file)
         return
 
-    season_response = fetch_season()
-    if season_active(season_response):
-        tree = fetch_tree()
-        find_circles_of_suck(tree)
+    # an offline run replays whatever season is cached, active or not
+    # the fetcher is closed however the run ends, so its threads and connections
+    # never outlive it
+    try:
+        season_response = fetch_season()
+        if OFFLINE or season_active(season_response):
+            tree = fetch_tree()
+            find_circles_of_suck(tree)
+    finally:
+        fetcher.report()
+        fetcher.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--offline', action='store_true', help='serve every api call from the response cache')
+    parser.add_argument('--ingest', choices=['schedule', 'scoreboard'], default='schedule', help='fetch games from every team schedule or from the league scoreboard')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes solving groups in parallel')
+    parser.add_argument('--low-memory', action='store_true', help='search with inclusion-exclusion in polynomial memory instead of a memoized depth-first search, trading time for space')
+    args = parser.parse_args()
+
     sports = {
         'football': [
             {'nfl': {
@@ -335,7 +576,8 @@ if __name__ == "__main__":
         'basketball': [
             {'mens-college-basketball': {
                 'season': '2023',
-                'season_type': 2
+                'season_type': 2,
+                'scoreboard_group': '50'
             }},
             {'womens-college-basketball': {
                 'season': '2023',
@@ -362,6 +604,7 @@ if __name__ == "__main__":
                     season = details['season']
                     season_type = details['season_type']
                     group = details.get('group', '')
+                    scoreboard_group = details.get('scoreboard_group', '')
 
-                    bot(sport, league_name, season, season_type, group)
+                    bot(sport, league_name, season, season_type, group, args.workers, args.offline, args.ingest, args.low_memory, scoreboard_group)
 
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+from files import write_json
+
+# ==================================================
+#                  response cache
+# ==================================================
+
+# seconds a response stays fresh, the first pattern found in the url wins
+# teams and groups barely change during a season, schedules change every game
+TTLS = [
+    ('/schedule', 15 * 60),
+    ('/scoreboard', 5 * 60),
+    ('/groups', 7 * 24 * 60 * 60),
+    ('/teams', 7 * 24 * 60 * 60),
+    ('/seasons/', 60 * 60),
+]
+DEFAULT_TTL = 24 * 60 * 60
+
+class OfflineCacheMiss(Exception):
+    def __init__(self, url):
+        super().__init__(f'{url} is not cached and the cache is offline')
+        self.url = url
+
+# on-disk cache of api responses keyed by url
+# stale entries are revalidated with their etag or last-modified date, and an
+# offline cache never touches the network, serving whatever it has
+class ResponseCache:
+    def __init__(self, directory='data/cache', offline=False):
+        self.directory = directory
+        self.offline = offline
+
+    def path(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def ttl(self, url):
+        for pattern, ttl in TTLS:
+            if pattern in url:
+                return ttl
+        return DEFAULT_TTL
+
+    def load(self, url):
+        try:
+            with open(self.path(url), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl(entry['url'])
+
+    # headers asking the server to answer 304 if the cached entry is still current
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None):
+        entry = {
+            'url': url,
+            'fetched_at': time.time(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body
+        }
+        self.write(entry)
+        return entry
+
+    # a 304 means the cached body is current again
+    def refresh(self, entry):
+        entry['fetched_at'] = time.time()
+        self.write(entry)
+
+    # written atomically, so readers never see half an entry
+    def write(self, entry):
+        write_json(self.path(entry['url']), entry)
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import collections
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from cache import OfflineCacheMiss
+
+# ==================================================
+#                  pooled fetching
+# ==================================================
+
+# responses worth asking for again after a pause
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# shared connection pool for every api call of a run
+# fetch_json can be awaited from many coroutines at once, at most concurrency
+# requests are in flight and failed requests are retried with exponential backoff
+# responses are served from cache (a ResponseCache) while they are fresh
+# every url is requested at most once per run, later and concurrent callers
+# share the first response and are counted as duplicates
+class Fetcher:
+    def __init__(self, concurrency=16, retries=3, backoff=0.5, timeout=30, cache=None):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # keep up to concurrency connections open per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # requests blocks, so coroutines hand their requests to these threads
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.loop = None
+        self.semaphore = None
+
+        # responses of this run by url, requests still in flight, and how many
+        # times each url was asked for again
+        self.responses = {}
+        self.pending = {}
+        self.duplicates = collections.Counter()
+
+    # one attempt at fetching url
+    def attempt(self, url):
+        if self.cache is None:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        entry = self.cache.load(url)
+        if entry is not None and (self.cache.offline or self.cache.fresh(entry)):
+            return entry['body']
+        if self.cache.offline:
+            raise OfflineCacheMiss(url)
+
+        # revalidate a stale entry instead of downloading it again
+        response = self.session.get(url, headers=self.cache.conditional_headers(entry), timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry)
+            return entry['body']
+        response.raise_for_status()
+        body = response.json()
+        self.cache.store(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return body
+
+    def retryable(self, error):
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS_CODES
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def delay(self, attempt):
+        return self.backoff * 2 ** attempt
+
+    def get_json(self, url):
+        if url in self.responses:
+            self.duplicates[url] += 1
+            return self.responses[url]
+
+        for attempt in range(self.retries + 1):
+            try:
+                body = self.attempt(url)
+                break
+            except requests.RequestException as error:
+                if attempt == self.retries or not self.retryable(error):
+                    raise
+                time.sleep(self.delay(attempt))
+        self.responses[url] = body
+        return body
+
+    # the semaphore and in-flight requests belong to the event loop they were
+    # created in, so start over whenever the fetcher is used from a new loop
+    def limiter(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.pending = {}
+        return self.semaphore
+
+    async def download(self, url):
+        loop = asyncio.get_running_loop()
+        async with self.limiter():
+            for attempt in range(self.retries + 1):
+                try:
+                    body = await loop.run_in_executor(self.executor, self.attempt, url)
+                    break
+                except requests.RequestException as error:
+                    if attempt == self.retries or not self.retryable(error):
+                        raise
+                    await asyncio.sleep(self.delay(attempt))
+        self.responses[url] = body
+        return body
+
+    async def fetch_json(self, url):
+        if url in self.responses:
+            self.duplicates[url] += 1
+            return self.responses[url]
+
+        # wait for the request already in flight instead of sending another
+        self.limiter()
+        if url in self.pending:
+            self.duplicates[url] += 1
+            return await self.pending[url]
+
+        task = asyncio.ensure_future(self.download(url))
+        self.pending[url] = task
+        try:
+            return await task
+        finally:
+            self.pending.pop(url, None)
+
+    # fetch every url concurrently, results are in the same order as urls
+    async def fetch_all(self, urls):
+        return await asyncio.gather(*(self.fetch_json(url) for url in urls))
+
+    def report(self):
+        if self.duplicates:
+            print(f'Served {sum(self.duplicates.values())} duplicate requests for {len(self.duplicates)} urls from {len(self.responses)} fetched')
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
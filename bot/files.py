@@ -0,0 +1,22 @@
+import os
+import json
+import tempfile
+
+# ==================================================
+#                   atomic writes
+# ==================================================
+
+# the process umask, read once since os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# write to a temporary file and rename it, so readers never see half a file
+# mkstemp creates the temporary file readable by its owner only and the rename
+# keeps that, so it first gets the mode open would have given a new file
+def write_json(path, data, indent=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(data, file, indent=indent)
+    os.chmod(temporary_path, 0o666 & ~UMASK)
+    os.replace(temporary_path, path)
@@ -0,0 +1,153 @@
+import os
+import json
+import mmap
+import struct
+from datetime import datetime, timezone
+from algorithm.data import GroupNode, TeamNode, Game
+from files import write_json
+
+# ==================================================
+#                    game store
+# ==================================================
+
+# one fixed-width record per finished game: game id, date in minutes since the
+# epoch, week (index into the week table), home and away team (indices into the
+# team table), home and away score, and whether the home team won
+GAME_RECORD = struct.Struct('<qqHHHhhB')
+
+DATE_FORMAT = '%Y-%m-%dT%H:%MZ'
+
+def date_to_minutes(date_str):
+    return int(datetime.strptime(date_str, DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp()) // 60
+
+def minutes_to_date(minutes):
+    return datetime.fromtimestamp(minutes * 60, timezone.utc).strftime(DATE_FORMAT)
+
+# a season on disk: tables.json holds the groups, teams and week labels, and
+# games.bin is an append-only log of game records
+# new games are appended to the log, the object graph is never written out
+class GameStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables_path = os.path.join(directory, 'tables.json')
+        self.games_path = os.path.join(directory, 'games.bin')
+        self.tables = None
+        self.team_index = {}
+        self.week_index = {}
+
+    def exists(self):
+        return os.path.exists(self.tables_path)
+
+    # start a new store for the tree, groups are listed parents first
+    def create(self, root, teams_dict):
+        groups = []
+        group_index = {}
+        teams = []
+        for node in [root] + list(root.descendants):
+            if isinstance(node, GroupNode):
+                group_index[id(node)] = len(groups)
+                groups.append({
+                    'id': node.id,
+                    'name': node.name,
+                    'abbreviation': node.abbreviation,
+                    'parent': group_index[id(node.parent)] if node.parent else None
+                })
+        for team_node in teams_dict.values():
+            teams.append({
+                'id': team_node.id,
+                'name': team_node.name,
+                'abbreviation': team_node.abbreviation,
+                'logo': team_node.logo,
+                'parent': group_index[id(team_node.parent)]
+            })
+
+        self.set_tables({'groups': groups, 'teams': teams, 'weeks': []})
+        self.write_tables()
+        with open(self.games_path, 'wb'):
+            pass
+
+    def set_tables(self, tables):
+        self.tables = tables
+        self.team_index = {team['id']: i for i, team in enumerate(tables['teams'])}
+        self.week_index = {week: i for i, week in enumerate(tables['weeks'])}
+
+    # written atomically, so readers never see half a table
+    def write_tables(self):
+        write_json(self.tables_path, self.tables)
+
+    # rebuild the tree from the tables and read every game in the log
+    # returns the root, teams by id, groups by id and the games in log order
+    def load(self):
+        with open(self.tables_path, 'r') as file:
+            self.set_tables(json.load(file))
+
+        # a store converted from a tree that keyed groups by name may repeat an
+        # id, the repeats fall back to path_id
+        group_nodes = []
+        groups_dict = {}
+        for group in self.tables['groups']:
+            parent = group_nodes[group['parent']] if group['parent'] is not None else None
+            group_id = group.get('id') if group.get('id') not in groups_dict else None
+            group_node = GroupNode(group['name'], group['abbreviation'], parent, group_id)
+            group_nodes.append(group_node)
+            groups_dict[group_node.id] = group_node
+
+        team_nodes = []
+        for team in self.tables['teams']:
+            team_nodes.append(TeamNode(team['id'], team['name'], team['abbreviation'], team['logo'], group_nodes[team['parent']]))
+        teams_dict = {team_node.id: team_node for team_node in team_nodes}
+
+        weeks = self.tables['weeks']
+        games = []
+        for game_id, minutes, week, home, away, home_score, away_score, home_team_won in self.records():
+            games.append(Game(
+                str(game_id),
+                minutes_to_date(minutes),
+                weeks[week],
+                team_nodes[home],
+                team_nodes[away],
+                home_score,
+                away_score,
+                bool(home_team_won)
+            ))
+
+        return group_nodes[0], teams_dict, groups_dict, games
+
+    # every whole record in the log, a record cut short by a crash is ignored
+    def records(self):
+        size = os.path.getsize(self.games_path)
+        count = size // GAME_RECORD.size
+        if count == 0:
+            return []
+        with open(self.games_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return list(GAME_RECORD.iter_unpack(mapped[:count * GAME_RECORD.size]))
+
+    # add games to the end of the log, new week labels are added to the tables first
+    def append(self, games):
+        new_weeks = [game.week for game in games if game.week not in self.week_index]
+        if new_weeks:
+            for week in dict.fromkeys(new_weeks):
+                self.week_index[week] = len(self.tables['weeks'])
+                self.tables['weeks'].append(week)
+            self.write_tables()
+
+        # drop a record cut short by a crash so the log stays aligned
+        size = os.path.getsize(self.games_path)
+        if size % GAME_RECORD.size:
+            os.truncate(self.games_path, size - size % GAME_RECORD.size)
+
+        with open(self.games_path, 'ab') as file:
+            for game in games:
+                file.write(GAME_RECORD.pack(
+                    int(game.id),
+                    date_to_minutes(game.date),
+                    self.week_index[game.week],
+                    self.team_index[game.home_team.id],
+                    self.team_index[game.away_team.id],
+                    game.home_score,
+                    game.away_score,
+                    game.home_team_won
+                ))
+            file.flush()
+            os.fsync(file.fileno())
@@ -0,0 +1,85 @@
+import os
+import json
+import fcntl
+from contextlib import contextmanager
+from files import write_json
+
+# ==================================================
+#                 suck tree shards
+# ==================================================
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as file:
+        return json.load(file)
+
+# hold an exclusive lock on path for the duration, so leagues running at the
+# same time take turns updating a shard
+@contextmanager
+def locked(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+# path is the names of the groups from the league down
+def insert(tree, path, circle_of_suck):
+    for name in path:
+        tree = tree.setdefault(name, {})
+    tree['suck'] = circle_of_suck
+
+# the circles of suck of one sport and season, a shard of the suck tree
+# index.json maps every sport and season to its shard for readers of the results,
+# data/suck_tree.json from before the shards seeds a shard that does not exist yet
+# circles found during a run are buffered and written by flush, which merges
+# them into the shard as it is on disk at that moment
+class SuckTree:
+    def __init__(self, sport, season, directory='data/suck_tree', legacy_path='data/suck_tree.json'):
+        self.sport = sport
+        self.season = str(season)
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.index_path = os.path.join(directory, 'index.json')
+        self.shard_path = os.path.join(directory, sport, f'{self.season}.json')
+        self.pending = []
+        self.tree = self.read()
+
+    def read(self):
+        if os.path.exists(self.shard_path):
+            return read_json(self.shard_path, {})
+        legacy_tree = read_json(self.legacy_path, {})
+        return legacy_tree.get(self.sport, {}).get(self.season, {})
+
+    def exists(self, path):
+        current_item = self.tree
+        for name in path:
+            if name not in current_item:
+                return False
+            current_item = current_item[name]
+        return 'suck' in current_item
+
+    def add(self, path, circle_of_suck):
+        self.pending.append((path, circle_of_suck))
+        insert(self.tree, path, circle_of_suck)
+
+    def flush(self):
+        if not self.pending:
+            return
+        with locked(f'{self.shard_path}.lock'):
+            shard = self.read()
+            for path, circle_of_suck in self.pending:
+                insert(shard, path, circle_of_suck)
+            write_json(self.shard_path, shard, indent=4)
+
+        with locked(f'{self.index_path}.lock'):
+            index = read_json(self.index_path, {})
+            if self.season not in index.get(self.sport, {}):
+                index.setdefault(self.sport, {})[self.season] = os.path.relpath(self.shard_path, self.directory)
+                write_json(self.index_path, index, indent=4)
+
+        self.tree = shard
+        self.pending = []
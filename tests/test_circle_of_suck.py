@@ -0,0 +1,130 @@
+import os
+import random
+import sys
+from itertools import permutations
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from algorithm.graph import is_strongly_connected, is_semicomplete
+from algorithm.circle_of_suck import (
+    batch_hamiltonian_cycles, kernelize, solve_kernel, tournament_hamiltonian_cycle,
+    inclusion_exclusion_count, inclusion_exclusion_cycle, hamiltonian_cycle,
+    hamiltonian_cycle_through, search_cycle, split_search_cycle,
+)
+
+# the solvers are checked against trying every ordering of the teams, so the
+# groups stay small enough for that
+
+# random win bitmasks for num_teams teams, each pair plays with probability density
+# and splits its games one time in ten
+def random_wins(rng, num_teams, density):
+    wins = [0] * num_teams
+    for i in range(num_teams):
+        for j in range(i + 1, num_teams):
+            if rng.random() < density:
+                outcome = rng.random()
+                if outcome < 0.45:
+                    wins[i] |= 1 << j
+                elif outcome < 0.9:
+                    wins[j] |= 1 << i
+                else:
+                    wins[i] |= 1 << j
+                    wins[j] |= 1 << i
+    return wins
+
+def random_groups(seed, count, sizes=range(2, 8), densities=(0.3, 0.5, 0.7, 0.9)):
+    rng = random.Random(seed)
+    return [random_wins(rng, rng.choice(sizes), rng.choice(densities)) for _ in range(count)]
+
+# every hamiltonian cycle that starts and ends on team 0
+def brute_force_cycles(wins):
+    num_teams = len(wins)
+    if num_teams < 2:
+        return []
+    cycles = []
+    for order in permutations(range(1, num_teams)):
+        cycle = (0,) + order + (0,)
+        if all(wins[u] >> v & 1 for u, v in zip(cycle, cycle[1:])):
+            cycles.append(list(cycle))
+    return cycles
+
+def is_cycle(wins, cycle, edge=None):
+    steps = list(zip(cycle, cycle[1:]))
+    return (
+        cycle[0] == 0 and cycle[-1] == 0
+        and sorted(cycle[:-1]) == list(range(len(wins)))
+        and all(wins[u] >> v & 1 for u, v in steps)
+        and (edge is None or edge in steps)
+    )
+
+def check(wins, cycle, edge=None):
+    exists = any(edge is None or edge in zip(found, found[1:]) for found in brute_force_cycles(wins))
+    assert (cycle is not None) == exists, (wins, cycle)
+    if cycle is not None:
+        assert is_cycle(wins, cycle, edge), (wins, cycle)
+
+def test_batch_hamiltonian_cycles():
+    groups = random_groups(1, 600)
+    by_size = {}
+    for wins in groups:
+        by_size.setdefault(len(wins), []).append(wins)
+    for same_size in by_size.values():
+        for wins, cycle in zip(same_size, batch_hamiltonian_cycles(same_size)):
+            check(wins, cycle)
+
+def test_kernelize():
+    for wins in random_groups(2, 1500):
+        kernel = kernelize(wins)
+        if kernel is None:
+            assert not brute_force_cycles(wins), wins
+            continue
+
+        # every team lands in exactly one path, team 0 in the first
+        paths, kernel_wins = kernel
+        assert sorted(team for path in paths for team in path) == list(range(len(wins)))
+        assert 0 in paths[0]
+
+        # the kernel has a cycle exactly when the group does, and it expands into one
+        def solve(kernel_wins):
+            cycles = brute_force_cycles(kernel_wins)
+            return cycles[0] if cycles else None
+        check(wins, solve_kernel(paths, kernel_wins, solve))
+
+def test_tournament_hamiltonian_cycle():
+    rng = random.Random(3)
+    tested = 0
+    while tested < 300:
+        wins = random_wins(rng, rng.randint(2, 8), 1.0)
+        if not is_strongly_connected(wins):
+            continue
+        assert is_semicomplete(wins)
+        assert is_cycle(wins, tournament_hamiltonian_cycle(wins)), wins
+        tested += 1
+
+def test_inclusion_exclusion_count():
+    for wins in random_groups(4, 600):
+        assert inclusion_exclusion_count(wins) == len(brute_force_cycles(wins)), wins
+
+def test_inclusion_exclusion_cycle():
+    for wins in random_groups(5, 400):
+        if is_strongly_connected(wins):
+            check(wins, inclusion_exclusion_cycle(wins))
+
+def test_hamiltonian_cycle():
+    for wins in random_groups(6, 1500):
+        check(wins, hamiltonian_cycle(wins))
+        check(wins, hamiltonian_cycle(wins, low_memory=True))
+
+def test_search_cycle():
+    for wins in random_groups(7, 1500, sizes=range(1, 8)):
+        check(wins, search_cycle(wins))
+
+def test_hamiltonian_cycle_through():
+    rng = random.Random(8)
+    for wins in random_groups(8, 600):
+        results = [(winner, loser) for winner in range(len(wins)) for loser in range(len(wins)) if wins[winner] >> loser & 1]
+        if results:
+            edge = rng.choice(results)
+            check(wins, hamiltonian_cycle_through(wins, edge), edge)
+
+def test_split_search_cycle():
+    for wins in random_groups(9, 20, sizes=range(4, 8)):
+        check(wins, split_search_cycle(wins, 2))